@@ -0,0 +1,96 @@
+"""
+跨门店购物篮优化（NumPy）
+
+把最新快照装成 (商品 × 门店) 价格矩阵，缺价为 NaN。对每个门店组合（3 家门店就是
+7 个组合），每件商品取组合内最低价，一次按列算完：
+  - covered：组合里至少一家有价的商品数
+  - total：这些商品的最低价之和
+  - cost：total + TRIP_COST × (组合门店数 − 1)，每多跑一家店算一次路程成本
+每个门店数（1 / 2 / 3 家）选出最优组合：先比谁覆盖的商品多，再比 cost。
+daily_summary_message 用 plans() 的结果列出 1 / 2 / 3 家店各自的最省方案。
+
+unit_best() 用同样的矩阵比单价（PriceRecord.unit_price，已规范化成 $/kg、$/l、$/ea），
+每件商品只比单位和多数门店一致的格子，包装大小不同时看谁真正便宜。
+"""
+import os
+from itertools import combinations
+
+import numpy as np
+
+STORES    = ("Woolworths", "Coles", "ALDI")
+TRIP_COST = float(os.environ.get("BASKET_TRIP_COST", 0))   # 每多去一家店的成本（$）
+
+
+def matrix(prices: dict, stores=STORES, field: str = "price") -> tuple[list, np.ndarray]:
+    """{商品: {门店: 结果}} → (商品名列表, (N, S) 矩阵)；field="unit_price" 时是单价"""
+    names = list(prices)
+    m = np.full((len(names), len(stores)), np.nan)
+    col = {s: j for j, s in enumerate(stores)}
+    for i, name in enumerate(names):
+        for store, r in (prices[name] or {}).items():
+            if r and r.get(field) is not None and store in col:
+                m[i, col[store]] = r[field]
+    return names, m
+
+
+def unit_best(prices: dict, stores=STORES) -> dict:
+    """{商品: (门店, $/单位, 单位)}，只含至少两家门店单位一致、能比单价的商品"""
+    names, m = matrix(prices, stores, "unit_price")
+    if not names:
+        return {}
+    codes = {}
+    units = np.array([[codes.setdefault((prices[n].get(s) or {}).get("unit") or "", len(codes))
+                       for s in stores] for n in names])
+    valid = ~np.isnan(m)
+    # 每行以多数门店的单位为准（平票取靠前的门店）
+    agree = ((units[:, :, None] == units[:, None, :]) & valid[:, None, :]).sum(axis=2)
+    ref   = units[np.arange(len(names)), np.where(valid, agree, -1).argmax(axis=1)]
+    same  = valid & (units == ref[:, None])
+    pick  = np.where(same, m, np.inf).argmin(axis=1)
+    label = {c: u for u, c in codes.items()}
+    return {names[i]: (stores[pick[i]], float(m[i, pick[i]]), label[ref[i]])
+            for i in np.flatnonzero(same.sum(axis=1) >= 2)}
+
+
+def solve(m: np.ndarray, trip_cost: float = TRIP_COST, max_stores: int | None = None) -> dict:
+    """
+    每个门店数的最优组合：{k: {"stores": (列号...), "total", "cost", "covered", "choice"}}；
+    choice 是每件商品在哪一列买（没有价格为 -1）
+    """
+    n, s = m.shape
+    filled = np.where(np.isnan(m), np.inf, m)
+    best = {}
+    for k in range(1, min(s, max_stores or s) + 1):
+        for cols in combinations(range(s), k):
+            sub    = filled[:, cols]
+            pick   = sub.argmin(axis=1)
+            low    = sub[np.arange(n), pick]
+            has    = np.isfinite(low)
+            total  = float(low[has].sum())
+            cost   = total + trip_cost * (k - 1)
+            rank   = (-int(has.sum()), round(cost, 2))
+            if k not in best or rank < best[k]["rank"]:
+                best[k] = {"stores": cols, "total": round(total, 2), "cost": round(cost, 2),
+                           "covered": int(has.sum()), "rank": rank,
+                           "choice": np.where(has, np.asarray(cols)[pick], -1)}
+    for plan in best.values():
+        del plan["rank"]
+    return best
+
+
+def plans(prices: dict, stores=STORES, trip_cost: float = TRIP_COST) -> dict:
+    """给 daily_summary_message 用：门店名代替列号，按门店数分组的最优方案"""
+    names, m = matrix(prices, stores)
+    if not names:
+        return {}
+    out = {}
+    for k, p in solve(m, trip_cost).items():
+        out[k] = {
+            "stores":  [stores[j] for j in p["stores"]],
+            "total":   p["total"],
+            "cost":    p["cost"],
+            "covered": p["covered"],
+            "items":   len(names),
+            "split":   {stores[j]: int((p["choice"] == j).sum()) for j in p["stores"]},
+        }
+    return out
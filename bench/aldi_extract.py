@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+ALDI 分类页解析微基准：单遍 tile 提取 vs 原来的三重策略链。
+
+    python bench/aldi_extract.py                         # 合成分类页（默认 400 个 tile）
+    python bench/aldi_extract.py --fixture page.html     # 用抓下来的真实分类页
+
+三重策略链对每个关键词都重新解析整页（原来的 get_price 行为）；
+单遍提取整页只解析一次，之后关键词都查索引。报告耗时和 tracemalloc 峰值内存。
+"""
+import argparse
+import random
+import re
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bs4 import BeautifulSoup   # noqa: E402
+
+from scraper import aldi        # noqa: E402
+
+KEYWORDS = ["Full Cream Milk 2L", "Lite Milk", "Cage Free Eggs 12 Pack",
+            "Barista Milk", "Lactose Free Milk", "Not On Page Xyz"]
+
+
+def synthetic_page(tiles: int, seed: int = 3163) -> str:
+    rnd   = random.Random(seed)
+    words = ["Farmdale", "Full", "Cream", "Lite", "Milk", "Barista", "Lactose", "Free",
+             "Organic", "Eggs", "Cage", "12", "Pack", "2L", "1L", "3L", "Pure", "Fresh"]
+    parts = ["<html><head>", "<script>" + "var x=1;" * 2000 + "</script>",
+             "</head><body><nav>" + "<a href='#'>link</a>" * 300 + "</nav><ul>"]
+    for i in range(tiles):
+        name  = " ".join(rnd.sample(words, 4))
+        price = f"{rnd.uniform(0.8, 9.9):.2f}"
+        if i % 3:
+            parts.append(
+                f"<li class='ft-product-tile'><div class='tile-body'>"
+                f"<h3 class='product-tile__name'>{name}</h3>"
+                f"<span class='price'>${price}</span>"
+                f"<div class='badges'>{'<span>tag</span>' * 8}</div></div></li>")
+        else:
+            parts.append(
+                f"<div class='tile--product'><p class='box--description--header'>{name}</p>"
+                f"<span class='box--value'>${price}</span></div>")
+    parts.append("</ul><footer>" + "<p>footer text</p>" * 500 + "</footer></body></html>")
+    return "".join(parts)
+
+
+# ── 原来的三重策略链（保留在这里作对照）────────────────────────────────────────
+
+def _legacy_match(cards, kw_lower, keyword, strategy):
+    kw_words = kw_lower.split()
+    for card in cards:
+        text = card.get_text(" ", strip=True)
+        if not any(w in text.lower() for w in kw_words):
+            continue
+        price_m = re.search(r"\$\s*(\d+\.\d{2})", text)
+        if not price_m:
+            continue
+        name_el = card.select_one("[class*='name'], [class*='title'], h2, h3")
+        return (name_el.get_text(strip=True) if name_el else keyword, float(price_m.group(1)), strategy)
+    return None
+
+
+def _legacy_generic(soup, kw_lower, keyword):
+    kw_words = kw_lower.split()
+    for tag in soup.find_all(string=re.compile(kw_lower, re.I)):
+        container = tag.find_parent(["li", "article", "div", "section"])
+        if not container:
+            continue
+        text = container.get_text(" ", strip=True)
+        if len(text) > 600 or not any(w in text.lower() for w in kw_words):
+            continue
+        price_m = re.search(r"\$\s*(\d+\.\d{2})", text)
+        if price_m:
+            return (keyword, float(price_m.group(1)), "generic")
+    return None
+
+
+def legacy_lookup(html: str, keyword: str):
+    kw_lower = keyword.lower()
+    soup = BeautifulSoup(html, "html.parser")
+    return (
+        _legacy_match(soup.select("li.ft-product-tile, li[class*='product-tile'], "
+                                  "div[class*='product-tile'], article[class*='tile']"),
+                      kw_lower, keyword, "new")
+        or _legacy_match(soup.select("div.tile--product, div.product-item, "
+                                     "div[data-module='product'], li[class*='item']"),
+                         kw_lower, keyword, "old")
+        or _legacy_generic(soup, kw_lower, keyword)
+    )
+
+
+def single_pass_lookup(html: str, keywords):
+    page = aldi._build_index(html)
+    out  = []
+    for kw in keywords:
+        kw_lower = kw.lower()
+        out.append(aldi._lookup(page, kw_lower, kw)
+                   or aldi._strategy_generic(aldi._full_soup(page), kw_lower, kw))
+    return out
+
+
+def measure(fn, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--fixture", type=Path)
+    ap.add_argument("--tiles", type=int, default=400)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    html = args.fixture.read_text(encoding="utf-8") if args.fixture else synthetic_page(args.tiles)
+    print(f"页面 {len(html) / 1024:.0f} KB, 关键词 {len(KEYWORDS)} 个, 解析器 {aldi._PARSER}")
+
+    rows = [
+        ("三重策略链（每词整页解析）", lambda: [legacy_lookup(html, kw) for kw in KEYWORDS]),
+        ("单遍 tile 提取 + 索引",     lambda: single_pass_lookup(html, KEYWORDS)),
+    ]
+    for label, fn in rows:
+        secs, peak = measure(fn, args.repeat)
+        print(f"  {label:<24} {secs * 1000:8.1f} ms   峰值 {peak / 1024 / 1024:6.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+basket.solve 基准：N 件商品 × 3 家门店，约 10% 的格子缺价。
+
+    python bench/basket.py                          # 1000 / 5000 / 20000 件
+    python bench/basket.py --items 100000 --trip-cost 2
+
+对照组是逐件商品、逐个门店组合的纯 Python 循环（只在 N 不太大时跑），
+两边的最优组合和总价必须一致。
+"""
+import argparse
+import sys
+import time
+from itertools import combinations
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import basket   # noqa: E402
+
+
+def synthetic(items: int, stores: int, seed: int = 3163) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    m   = np.round(rng.uniform(1, 20, size=(items, 1)) * rng.uniform(0.85, 1.15, size=(items, stores)), 2)
+    m[rng.random(m.shape) < 0.1] = np.nan
+    return m
+
+
+def naive(m: np.ndarray, trip_cost: float) -> dict:
+    rows, s = m.tolist(), m.shape[1]
+    best = {}
+    for k in range(1, s + 1):
+        for cols in combinations(range(s), k):
+            total, covered = 0.0, 0
+            for row in rows:
+                prices = [row[j] for j in cols if row[j] == row[j]]
+                if prices:
+                    total   += min(prices)
+                    covered += 1
+            rank = (-covered, round(total + trip_cost * (k - 1), 2))
+            if k not in best or rank < best[k][0]:
+                best[k] = (rank, cols, round(total, 2))
+    return {k: (cols, total) for k, (_, cols, total) in best.items()}
+
+
+def timed(label, fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    print(f"  {label:<28} {best * 1000:9.1f} ms")
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--items", type=int, nargs="+", default=[1000, 5000, 20000])
+    ap.add_argument("--stores", type=int, default=len(basket.STORES))
+    ap.add_argument("--trip-cost", type=float, default=1.5)
+    ap.add_argument("--naive-max", type=int, default=20000, help="超过这个件数不跑纯 Python 对照")
+    args = ap.parse_args()
+
+    for n in args.items:
+        m = synthetic(n, args.stores)
+        print(f"{n} 件 × {args.stores} 家门店（缺价 {np.isnan(m).mean():.0%}）")
+        fast = timed("basket.solve", lambda: basket.solve(m, args.trip_cost))
+        if n > args.naive_max:
+            continue
+        slow = timed("纯 Python 循环", lambda: naive(m, args.trip_cost), repeat=1)
+        same = all(fast[k]["stores"] == cols and abs(fast[k]["total"] - total) < 0.01
+                   for k, (cols, total) in slow.items())
+        print(f"  结果{'一致' if same else '不一致'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Telegram 命令处理对着本地假 Bot API 跑一遍：getUpdates 长轮询 → 回答 → sendMessage。
+
+    python bench/bot.py                         # 200 件商品，500 条命令
+    python bench/bot.py --items 1000 --commands 2000 --stale 0.5
+
+临时目录里合成 prices.json 和历史（--stale 比例的商品最后一次观测在 STALE_HOURS 之前），
+实时抓取用一个计数的假取价函数代替 monitor.fetch_prices。报告每条命令的耗时
+（第一次 / LRU 命中）、实时抓取次数，并检查过期数据只抓一次、别的会话的命令不回答。
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import bot, history                           # noqa: E402
+from scraper import notify, record            # noqa: E402
+from scraper.replay import ReplayServer       # noqa: E402
+
+STORES = ("Woolworths", "Coles", "ALDI")
+
+
+class FakeBotAPI:
+    """getUpdates 从脚本里的消息按 offset 发，sendMessage 记下回复"""
+
+    def __init__(self, messages: list):
+        self.updates  = [{"update_id": n + 1, "message": {"chat": {"id": chat}, "text": text}}
+                         for n, (chat, text) in enumerate(messages)]
+        self.replies  = []
+        self.polls    = 0
+        self._lock    = threading.Lock()
+
+    def __call__(self, method, url, body):
+        path, _, query = url.partition("?")
+        if path.endswith("/getUpdates"):
+            params = dict(p.split("=", 1) for p in query.split("&") if "=" in p)
+            offset = int(params.get("offset", 0))
+            with self._lock:
+                self.polls += 1
+                batch = [u for u in self.updates if u["update_id"] >= offset][:100]
+            return 200, {"Content-Type": "application/json"}, json.dumps({"ok": True, "result": batch})
+        if path.endswith("/sendMessage"):
+            with self._lock:
+                self.replies.append(json.loads(body))
+            return 200, {"Content-Type": "application/json"}, json.dumps({"ok": True, "result": {}})
+        return None
+
+
+def synthetic(items: int, stale: float, seed: int = 3163):
+    rng       = random.Random(seed)
+    now       = datetime.now()
+    watchlist = [{"name": f"Item {n:04d}", "woolworths_id": str(100000 + n),
+                  "coles_query": f"item {n:04d}", "monitor_aldi": n % 2 == 0,
+                  "aldi_keyword": f"item {n:04d}"} for n in range(items)]
+    for day in range(30, 0, -3):
+        ts = (now - timedelta(days=day)).isoformat(timespec="minutes")
+        history.append({i["name"]: {s: {"price": round(rng.uniform(1, 20), 2)} for s in STORES}
+                        for i in watchlist}, ts)
+    fresh  = (now - timedelta(hours=1)).isoformat(timespec="minutes")
+    recent = [i for i in watchlist if rng.random() >= stale]
+    history.append({i["name"]: {s: {"price": round(rng.uniform(1, 20), 2)} for s in STORES}
+                    for i in recent}, fresh)
+    prices = {i["name"]: {s: record.build(s, "Carnegie", i["name"], round(rng.uniform(1, 20), 2),
+                                          unit_text=f"${rng.uniform(0.2, 2):.2f} / 100G")
+                          for s in STORES} for i in watchlist}
+    Path("data").mkdir(exist_ok=True)
+    Path("data/prices.json").write_text(record.dumps(prices), encoding="utf-8")
+    return watchlist
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--items", type=int, default=200)
+    ap.add_argument("--commands", type=int, default=500)
+    ap.add_argument("--stale", type=float, default=0.3, help="最后一次观测超过 STALE_HOURS 的商品比例")
+    args = ap.parse_args()
+
+    os.chdir(tempfile.mkdtemp())
+    watchlist = synthetic(args.items, args.stale)
+    rng   = random.Random(1)
+    names = [i["name"] for i in watchlist]
+    cmds  = [("1", rng.choice([f"/price {rng.choice(names)}", f"/history {rng.choice(names)}",
+                               f"/price@CarnegieBot {rng.choice(names).lower()}", "/best"]))
+             for _ in range(args.commands)]
+    cmds += [("999", "/best"), ("1", "你好")]          # 别的会话、不是命令：都不回答
+
+    api = FakeBotAPI(cmds)
+    srv = ReplayServer(fallback=api).start()
+    os.environ.update(TELEGRAM_BOT_TOKEN="TOKEN", TELEGRAM_CHAT_ID="1")
+    notify.API_BASE   = srv.url
+    notify.OUTBOX_DIR = Path("data/outbox")
+
+    fetched = []
+    def fetch(items, only):
+        fetched.extend(only)
+        found = {}
+        for name, store in only:
+            found.setdefault(name, {})[store] = record.build(store, "Carnegie", name, 9.99)
+        return found
+    stores_of = lambda item: [s for s in STORES if s != "ALDI" or item["monitor_aldi"]]
+
+    timings, offset = {"first": [], "cached": []}, None
+    handle = bot.handle
+    def timed_handle(text, *a):
+        hits = bot._render.cache_info().hits
+        t0   = time.perf_counter()
+        out  = handle(text, *a)
+        timings["cached" if bot._render.cache_info().hits > hits else "first"].append(time.perf_counter() - t0)
+        return out
+    bot.handle = timed_handle
+
+    t0 = time.perf_counter()
+    bot.refresh(Path("data/prices.json"))
+    while (updates := bot.poll(offset)):
+        offset = bot.answer(updates, watchlist, fetch, stores_of, bot.allowed_chats())
+    secs = time.perf_counter() - t0
+    left = notify.flush(timeout=600)
+    srv.stop()
+
+    ms = lambda xs: f"{sum(xs) / len(xs) * 1000:7.2f} ms × {len(xs)}" if xs else "—"
+    print(f"{args.items} 件商品，{args.commands} 条命令：处理 {secs:.1f}s（不含发送），getUpdates {api.polls} 次")
+    print(f"  第一次渲染  {ms(timings['first'])}")
+    print(f"  LRU 命中    {ms(timings['cached'])}")
+    once = len(fetched) == len(set(fetched))
+    print(f"  实时抓取 {len(fetched)} 个 (商品, 门店)，{'每个只抓一次' if once else '有重复抓取'}")
+    print(f"  回复 {len(api.replies)} 段（/best 超过 {notify.MAX_LEN} 字会切段），outbox 剩 {left}，"
+          f"{'没有' if all(r['chat_id'] == '1' for r in api.replies) else '有'}回复别的会话")
+
+
+if __name__ == "__main__":
+    main()
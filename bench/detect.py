@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+detect.analyse / ffill 基准：数千序列 × 多年、每天三次采样。
+
+    python bench/detect.py                          # 默认 5000 序列 × 3 年
+    python bench/detect.py --series 20000 --years 5
+
+合成矩阵里 70% 的格子是 NaN（模拟压缩后只剩变化点），先前向填充再整体分析。
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import detect   # noqa: E402
+
+
+def synthetic(series: int, samples: int, seed: int = 3163):
+    rng    = np.random.default_rng(seed)
+    base   = rng.uniform(1, 20, size=(series, 1))
+    walk   = base * (1 + rng.normal(0, 0.03, size=(series, samples)).cumsum(axis=1) * 0.05)
+    matrix = np.round(np.clip(walk, 0.5, None), 2)
+    matrix[rng.random(matrix.shape) < 0.7] = np.nan
+    matrix[:, 0] = base[:, 0]
+    current = np.round(base[:, 0] * rng.uniform(0.8, 1.1, size=series), 2)
+    return matrix, current, np.nanmin(matrix, axis=1)
+
+
+def timed(label, fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    print(f"  {label:<28} {best * 1000:9.1f} ms")
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--series", type=int, default=5000)
+    ap.add_argument("--years", type=float, default=3)
+    ap.add_argument("--per-day", type=int, default=3)
+    ap.add_argument("--weeks", type=int, default=detect.LOW_WEEKS)
+    args = ap.parse_args()
+
+    samples = int(args.years * 365 * args.per_day)
+    matrix, current, hist_low = synthetic(args.series, samples)
+    print(f"{args.series} 序列 × {samples} 采样 ({matrix.nbytes / 1024 / 1024:.0f} MB float64)")
+
+    filled = timed("ffill 全历史", lambda: detect.ffill(matrix))
+    window = filled[:, -args.weeks * 7 * args.per_day:]
+    timed(f"analyse 近 {args.weeks} 周窗口", lambda: detect.analyse(window, current, hist_low))
+    timed("analyse 全历史", lambda: detect.analyse(filled, current, hist_low))
+
+    tracemalloc.start()
+    detect.analyse(detect.ffill(matrix), current, hist_low)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  ffill + 全历史 analyse 峰值   {peak / 1024 / 1024:9.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+端到端基准：monitor.py 整体跑在本地回放服务器上，不访问真实网站。
+
+    python bench/e2e.py                             # 10 / 100 / 1000 件合成 watchlist
+    python bench/e2e.py --sizes 100 --fixtures fx/  # 优先用录制的 fixture
+    python bench/e2e.py --latency 0.05 0.2 --error-rate 0.02 --json report.json
+
+每个规模在临时目录里跑 --runs 次 monitor.py（第二次起价格有变动，会走检测和通知），
+报告墙钟时间、请求数、响应字节数（≈ 解析字节数）和子进程峰值 RSS。
+默认放开各门店限速以测量代码本身；--polite 保留 STORE_LIMITS 的真实节奏。
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from scraper.replay import ReplayServer   # noqa: E402
+
+ALDI_CATEGORIES = ["milk", "eggs", "bread", "butter", "chicken"]
+# scraper/aldi.py 里 CATEGORY_URLS 的路径结尾 → 分类
+ALDI_PATHS = {"/milk/": "milk", "/eggs/": "eggs", "/bread/": "bread",
+              "/butter-spreads/": "butter", "/meat-seafood/": "chicken"}
+
+
+def synthetic_watchlist(n: int) -> list:
+    return [{
+        "name":            f"合成商品 {i}",
+        "woolworths_id":   str(900000 + i),
+        "coles_query":     f"Synthetic Coles {i}",
+        "monitor_aldi":    i % 2 == 0,
+        "aldi_keyword":    f"{ALDI_CATEGORIES[i % 5]} synthetic {i}",
+        "alert_threshold": 0.10,
+    } for i in range(n)]
+
+
+def _price(key: str, seed: int) -> float:
+    return round(1 + (zlib.crc32(f"{key}/{seed}".encode()) % 900) / 100, 2)
+
+
+def synthetic_site(watchlist: list, state: dict):
+    """为回放服务器合成四个站点的响应；state["seed"] 变了价格就变"""
+    aldi_by_cat = {c: [w["aldi_keyword"] for w in watchlist if w["aldi_keyword"].startswith(c)]
+                   for c in ALDI_CATEGORIES}
+
+    def ww_product(pid):
+        return {"Stockcode": int(pid), "Name": f"WW Product {pid}", "Price": _price(pid, state["seed"]),
+                "WasPrice": None, "IsOnSpecial": False, "CupString": "$1.00 / 1EA"}
+
+    def respond(method, url, body):
+        u, seed = urlsplit(url), state["seed"]
+        path = u.path
+        if m := re.search(r"/apis/ui/products/([\d,]+)$", path):
+            return 200, {"Content-Type": "application/json"}, json.dumps(
+                [ww_product(pid) for pid in m.group(1).split(",")])
+        if m := re.search(r"/apis/ui/product/detail/(\d+)$", path):
+            return 200, {"Content-Type": "application/json"}, json.dumps({"Product": ww_product(m.group(1))})
+        if m := re.search(r"/shop/productdetails/(\d+)$", path):
+            p = ww_product(m.group(1))
+            enc = json.dumps(p).replace('"', "&q;")
+            return 200, {"Content-Type": "text/html"}, f"<html><body>{'<div>x</div>' * 2000}{enc}</body></html>"
+        if path.endswith("/api/2.0/market/products"):
+            q = parse_qs(u.query).get("q", [""])[0]
+            n = int(q.rsplit(" ", 1)[-1]) if q.rsplit(" ", 1)[-1].isdigit() else 0
+            results = [{"name": f"Synthetic Coles {k}",
+                        "pricing": {"now": _price(f"coles{k}", seed), "was": None,
+                                    "unit": {"ofMeasurePrice": "$1.00 per 1ea"}}}
+                       for k in range(n, n + 5)]
+            return 200, {"Content-Type": "application/json"}, json.dumps({"results": results})
+        if u.netloc.endswith("coles.com.au") and path == "/search":
+            return 200, {"Content-Type": "text/html"}, "<html><body>search</body></html>"
+        if u.netloc.endswith("aldi.com.au"):
+            cat = next((c for suffix, c in ALDI_PATHS.items() if path.endswith(suffix)), None)
+            tiles = "".join(
+                f"<li class='ft-product-tile'><h3 class='product-tile__name'>{kw.title()}</h3>"
+                f"<span>${_price(kw, seed):.2f}</span></li>"
+                for kw in aldi_by_cat.get(cat, []))
+            return 200, {"Content-Type": "text/html"}, f"<html><body><ul>{tiles}</ul></body></html>"
+        if path.endswith("/sendMessage"):
+            return 200, {"Content-Type": "application/json"}, json.dumps({"ok": True, "result": {}})
+        return None
+
+    return respond
+
+
+def run_monitor(workdir: Path, env: dict) -> tuple[float, int, int]:
+    """返回 (墙钟秒, 峰值 RSS KB, 退出码)"""
+    t0   = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, str(ROOT / "monitor.py")], cwd=workdir, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    _, status, usage = os.wait4(proc.pid, 0)
+    wall = time.perf_counter() - t0
+    err  = proc.stderr.read().decode(errors="replace")
+    if status:
+        print(err[-2000:], file=sys.stderr)
+    return wall, usage.ru_maxrss, os.waitstatus_to_exitcode(status)
+
+
+def bench_size(n: int, args) -> list:
+    watchlist = synthetic_watchlist(n)
+    state     = {"seed": 0}
+    server    = ReplayServer(args.fixtures, fallback=synthetic_site(watchlist, state),
+                             latency=tuple(args.latency), error_rate=args.error_rate).start()
+    rows = []
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            work = Path(tmp)
+            (work / "data").mkdir()
+            (work / "watchlist.json").write_text(json.dumps(watchlist, ensure_ascii=False), encoding="utf-8")
+            (work / "data" / "coles_api_url.txt").write_text("https://www.coles.com.au")
+            env = {**os.environ, "HTTP_REPLAY": server.url,
+                   "TELEGRAM_BOT_TOKEN": "bench", "TELEGRAM_CHAT_ID": "0"}
+            if not args.polite:
+                env["FETCH_LIMITS"] = json.dumps({s: {"rate": 1000, "burst": 100, "jitter": [0, 0]}
+                                                  for s in ("Woolworths", "Coles", "ALDI", "Telegram")})
+            for run in range(args.runs):
+                state["seed"] = run
+                req0, bytes0 = server.requests, server.bytes_sent
+                wall, rss, code = run_monitor(work, env)
+                rows.append({"items": n, "run": run + 1, "wall_s": round(wall, 3),
+                             "requests": server.requests - req0,
+                             "bytes": server.bytes_sent - bytes0,
+                             "peak_rss_mb": round(rss / 1024, 1), "exit": code})
+    finally:
+        server.stop()
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    ap.add_argument("--runs", type=int, default=2)
+    ap.add_argument("--fixtures", type=Path)
+    ap.add_argument("--latency", type=float, nargs=2, default=(0.0, 0.0))
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--polite", action="store_true")
+    ap.add_argument("--json", type=Path, help="把结果写成 JSON，供 CI 比较")
+    args = ap.parse_args()
+
+    print(f"{'件数':>6} {'轮':>3} {'墙钟(s)':>9} {'请求':>7} {'字节(KB)':>10} {'峰值RSS(MB)':>12}")
+    results = []
+    for n in args.sizes:
+        for row in bench_size(n, args):
+            results.append(row)
+            flag = "" if row["exit"] == 0 else f"  ⚠️ exit {row['exit']}"
+            print(f"{row['items']:>6} {row['run']:>3} {row['wall_s']:>9.2f} {row['requests']:>7} "
+                  f"{row['bytes'] / 1024:>10.0f} {row['peak_rss_mb']:>12.1f}{flag}")
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
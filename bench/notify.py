@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Telegram 通知管道对着本地假 Bot API 跑一遍：切段、429 retry_after、outbox 补发。
+
+    python bench/notify.py                      # 300 条变价提醒，每 20 条消息限流一次
+    python bench/notify.py --alerts 2000 --rate-limit-every 5
+
+第一阶段假服务器返回 502：所有段留在 data/outbox（临时目录里）；
+第二阶段服务器恢复：outbox 按顺序补发，再发新消息。报告段数、请求数、耗时，
+并检查服务器收到的每段都不超过 4096 字、拼起来和原文一致。
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from scraper import breaker, notify           # noqa: E402
+from scraper.replay import ReplayServer       # noqa: E402
+
+
+class FakeBotAPI:
+    """sendMessage 的最小实现：超长 400、每 N 条 429（retry_after）、可整体宕机"""
+
+    def __init__(self, rate_limit_every: int, retry_after: int):
+        self.every, self.retry_after = rate_limit_every, retry_after
+        self.down     = False
+        self.received = []
+        self.calls    = 0
+        self._lock    = threading.Lock()
+
+    def __call__(self, method, url, body):
+        if not url.endswith("/sendMessage"):
+            return None
+        with self._lock:
+            self.calls += 1
+            if self.down:
+                return 502, {"Content-Type": "text/plain"}, "bad gateway"
+            if self.every and self.calls % self.every == 0:
+                return 429, {"Content-Type": "application/json"}, json.dumps({
+                    "ok": False, "error_code": 429, "description": "Too Many Requests",
+                    "parameters": {"retry_after": self.retry_after}})
+            msg = json.loads(body)
+            if len(msg["text"]) > notify.MAX_LEN:
+                return 400, {"Content-Type": "application/json"}, json.dumps({
+                    "ok": False, "error_code": 400, "description": "Bad Request: message is too long"})
+            self.received.append(msg["text"])
+            return 200, {"Content-Type": "application/json"}, json.dumps({"ok": True, "result": {}})
+
+
+def fake_alerts(n: int) -> list[dict]:
+    return [{"item": f"Item {i} " + "x" * (i % 40), "store": ("Woolworths", "Coles", "ALDI")[i % 3],
+             "branch": "Carnegie", "old_price": 5.0 + i % 7, "new_price": 4.0 + i % 5,
+             "change": (4.0 + i % 5) - (5.0 + i % 7) or -0.5, "on_special": bool(i % 2)}
+            for i in range(n)]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--alerts", type=int, default=300)
+    ap.add_argument("--rate-limit-every", type=int, default=20)
+    ap.add_argument("--retry-after", type=int, default=1)
+    args = ap.parse_args()
+
+    api = FakeBotAPI(args.rate_limit_every, args.retry_after)
+    srv = ReplayServer(fallback=api).start()
+    os.environ.setdefault("TELEGRAM_BOT_TOKEN", "TOKEN")
+    os.environ.setdefault("TELEGRAM_CHAT_ID", "1")
+    notify.API_BASE   = srv.url
+    notify.OUTBOX_DIR = Path(tempfile.mkdtemp()) / "outbox"
+
+    text  = notify.price_change_message(fake_alerts(args.alerts))
+    parts = notify.split(text)
+    print(f"消息 {len(text)} 字 → {len(parts)} 段（上限 {notify.MAX_LEN}）")
+
+    api.down = True
+    notify.send(text)
+    left = notify.flush(timeout=60)
+    print(f"服务器宕机：{left} 段留在 outbox，请求 {api.calls} 次")
+
+    api.down = False
+    breaker.reset()
+    t0 = time.perf_counter()
+    notify.send("✅ 恢复")
+    left = notify.flush(timeout=600)
+    secs = time.perf_counter() - t0
+    srv.stop()
+
+    ok = "\n".join(api.received[:-1]) == text and all(len(p) <= notify.MAX_LEN for p in api.received)
+    print(f"恢复后：送达 {len(api.received)} 段，outbox 剩 {left}，请求 {api.calls} 次，"
+          f"耗时 {secs:.1f}s，内容{'一致' if ok else '不一致'}")
+
+
+if __name__ == "__main__":
+    main()
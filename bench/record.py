@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+PriceRecord 与原来的 dict 快照对比：内存、prices.json 读写、单价比较。
+
+    python bench/record.py                      # 20000 件 × 3 家门店
+    python bench/record.py --items 100000
+
+- 内存：tracemalloc 量整个快照（dict 记录 vs __slots__ 记录）
+- 写 / 读：json.dumps(indent=2) + json.loads vs record.dumps / record.loads（含还原成 PriceRecord）
+- 单价：每次比较都从 CupString 原文重新解析 vs basket.unit_best 对规范化后的数字整批比较
+"""
+import argparse
+import json
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import basket                    # noqa: E402
+from scraper import record       # noqa: E402
+
+STORES = ("Woolworths", "Coles", "ALDI")
+UNITS  = (("100G", 100, "g"), ("1KG", 1, "kg"), ("1L", 1, "l"), ("100ML", 100, "ml"), ("1EA", 1, "ea"))
+
+
+def synthetic(items: int, seed: int = 3163) -> tuple[dict, dict]:
+    """(原来的 dict 快照, PriceRecord 快照)，内容相同"""
+    rng = random.Random(seed)
+    old, new = {}, {}
+    for n in range(items):
+        name = f"Item {n:06d}"
+        label, qty, unit = rng.choice(UNITS)
+        old[name], new[name] = {}, {}
+        for store in STORES:
+            price = round(rng.uniform(1, 20), 2)
+            cup   = f"${price / rng.choice((2, 4, 5, 10)):.2f} / {label}"
+            special = rng.random() < 0.2
+            old[name][store] = {"store": store, "branch": "Carnegie", "name": name, "price": price,
+                                "was_price": round(price * 1.2, 2) if special else None,
+                                "unit_price": cup, "on_special": special, "source": "api"}
+            new[name][store] = record.build(store, "Carnegie", name, price,
+                                            old[name][store]["was_price"], special, "api", cup)
+    return old, new
+
+
+def timed(label, fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    print(f"  {label:<34} {best * 1000:9.1f} ms")
+    return out
+
+
+def size(build) -> float:
+    tracemalloc.start()
+    snapshot = build()
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del snapshot
+    return used / 1024 / 1024
+
+
+def reparse_best(snapshot: dict) -> dict:
+    """原来的做法：比较时从 CupString 原文解析单价"""
+    out = {}
+    for name, stores in snapshot.items():
+        parsed = [(s, *record.parse_unit(r["unit_price"])) for s, r in stores.items()]
+        parsed = [p for p in parsed if p[1] is not None]
+        if len(parsed) >= 2:
+            out[name] = min(parsed, key=lambda p: p[1])
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--items", type=int, default=20000)
+    args = ap.parse_args()
+
+    print(f"{args.items} 件 × {len(STORES)} 家门店")
+    print(f"  内存  dict {size(lambda: synthetic(args.items)[0]):7.1f} MB   "
+          f"PriceRecord {size(lambda: synthetic(args.items)[1]):7.1f} MB")
+    old, new = synthetic(args.items)
+
+    text_old = timed("写 json indent=2（dict）", lambda: json.dumps(old, indent=2, ensure_ascii=False))
+    text_new = timed("写 record.dumps", lambda: record.dumps(new))
+    timed("读 json.loads（dict）", lambda: json.loads(text_old))
+    loaded = timed("读 record.loads（→ PriceRecord）", lambda: record.loads(text_new))
+    print(f"  文件大小  {len(text_old.encode()) / 1024:8.0f} KB → {len(text_new.encode()) / 1024:8.0f} KB")
+
+    slow = timed("单价：逐条重新解析原文", lambda: reparse_best(old))
+    fast = timed("单价：basket.unit_best", lambda: basket.unit_best(loaded))
+    same = all(fast[n][0] == slow[n][0] for n in fast if len({r.unit for r in loaded[n].values()}) == 1)
+    print(f"  单价最优门店{'一致' if same else '不一致'}（单位相同的商品）")
+
+
+if __name__ == "__main__":
+    main()
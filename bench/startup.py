@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+启动成本：python -X importtime monitor.py --dry-run
+
+    python bench/startup.py                 # 每种情形跑 5 次取最好
+    python bench/startup.py --top 15        # 多列几个最慢的模块
+
+情形：
+  dry-run          monitor.py --dry-run（不导入任何爬虫）
+  eager-imports    一次性导入三家爬虫 + detect，相当于原来 monitor.py 顶部的导入
+报告墙钟、导入总耗时，以及累计耗时最多的顶层模块。
+"""
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+CASES = {
+    "dry-run":       [str(ROOT / "monitor.py"), "--dry-run"],
+    "eager-imports": ["-c", "import sys; sys.path.insert(0, %r); "
+                            "import scraper.woolworths, scraper.coles, scraper.aldi, detect" % str(ROOT)],
+}
+
+
+def run(args: list, cwd: Path) -> tuple[float, dict]:
+    """(墙钟秒, {顶层模块: 累计微秒})"""
+    t0   = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", *args], cwd=cwd,
+                          capture_output=True, text=True)
+    wall = time.perf_counter() - t0
+    if proc.returncode:
+        sys.exit(proc.stderr[-2000:])
+    top = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not name.startswith("   "):          # 只取顶层导入，子模块已经算在累计里
+            top[name.strip()] = int(cumulative)
+    return wall, top
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--top", type=int, default=8)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        (tmp / "watchlist.json").write_text(json.dumps([
+            {"name": "Milk", "woolworths_id": "888137", "coles_query": "milk 2l",
+             "monitor_aldi": True, "aldi_keyword": "Full Cream Milk 2L"}]), encoding="utf-8")
+        for case, argv in CASES.items():
+            best = min((run(argv, tmp) for _ in range(args.runs)), key=lambda r: r[0])
+            wall, top = best
+            print(f"{case:<14} 墙钟 {wall * 1000:7.1f} ms   导入合计 {sum(top.values()) / 1000:7.1f} ms")
+            for name, us in sorted(top.items(), key=lambda kv: -kv[1])[:args.top]:
+                print(f"    {us / 1000:7.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Woolworths 商品页 HTML 解析微基准：原来的整页替换 + 五次 re.search / 整块 json.loads
+vs 先定位商品 JSON 区段、一次扫描取全部字段 / 只 raw_decode "product" 对象。
+
+    python bench/ww_parse.py                          # 合成商品页（约 600 KB）
+    python bench/ww_parse.py --fixtures data/fixtures # HTTP_RECORD_DIR 录下的真实页面
+
+报告每页 CPU 时间（process_time）和 tracemalloc 峰值内存，并核对两边解析结果一致；
+另外用一个页面上没有的商品编号单独检查新实现不会误取别的商品。
+"""
+import argparse
+import json
+import random
+import re
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from scraper import woolworths   # noqa: E402
+
+
+def synthetic_pages(kb: int, seed: int = 3163) -> list[tuple[str, str, str]]:
+    """(名字, 商品编号, html)：一页 &q; 编码 JSON，一页 __NEXT_DATA__，前后填充脚本和导航"""
+    rnd     = random.Random(seed)
+    filler  = "<script>" + "".join(f"var v{i}={rnd.random()};" for i in range(kb * 40)) + "</script>"
+    nav     = "<nav>" + "<a href='/shop/browse/x'>Category</a>" * (kb * 4) + "</nav>"
+    product = {"Stockcode": 888137, "Name": "Woolworths Full Cream Milk 2L", "Price": 3.1,
+               "WasPrice": 3.5, "IsOnSpecial": True, "CupString": "$1.55 / 1L",
+               "Description": "x" * 2000}
+    encoded = json.dumps(product).replace('"', "&q;")
+    related = [{"name": f"Other {i}", "price": 1.0 + i} for i in range(200)]
+    nextd   = json.dumps({"props": {"pageProps": {
+        "product": {k[0].lower() + k[1:]: v for k, v in product.items()},
+        "related": related, "content": ["y" * 500] * (kb // 2)}}})
+    pid = str(product["Stockcode"])
+    return [
+        ("encoded",   pid, f"<html><head>{filler}</head><body>{nav}<script>window.state='{encoded}'</script></body></html>"),
+        ("next_data", pid, f"<html><head>{filler}</head><body>{nav}"
+                      f'<script id="__NEXT_DATA__" type="application/json">{nextd}</script></body></html>'),
+    ]
+
+
+def fixture_pages(directory: Path) -> list[tuple[str, str, str]]:
+    pages = []
+    for f in sorted(directory.glob("*.json")):
+        rec = json.loads(f.read_text(encoding="utf-8"))
+        if m := re.search(r"woolworths\.com\.au/shop/productdetails/(\d+)", rec.get("url", "")):
+            pages.append((rec["url"].rsplit("/", 1)[-1], m.group(1), rec["body"]))
+    return pages
+
+
+# ── 原来的实现（保留在这里作对照）──────────────────────────────────────────────
+
+def _rx(pattern, text, default=None):
+    m = re.search(pattern, text)
+    return m.group(1) if m else default
+
+
+def legacy_encoded(html, pid):
+    c = html.replace("&q;", '"').replace("&amp;", "&")
+    pm = re.search(r'"Price"\s*:\s*([\d.]+)', c)
+    if not pm:
+        return None
+    return (_rx(r'"Name"\s*:\s*"([^"]{3,100})"', c, f"WW-{pid}"), float(pm.group(1)),
+            float(_rx(r'"WasPrice"\s*:\s*([\d.]+)', c) or 0) or None,
+            _rx(r'"IsOnSpecial"\s*:\s*(true|false)', c) == "true")
+
+
+def legacy_next_data(html, pid):
+    m = re.search(r'<script id="__NEXT_DATA__"[^>]*>(.+?)</script>', html, re.DOTALL)
+    if not m:
+        return None
+    p = json.loads(m.group(1)).get("props", {}).get("pageProps", {}).get("product")
+    return p and (p.get("name"), float(p["price"]), p.get("wasPrice"), bool(p.get("isOnSpecial")))
+
+
+def legacy(html, pid):
+    return legacy_encoded(html, pid) or legacy_next_data(html, pid)
+
+
+def streaming(html, pid):
+    r = woolworths._parse_encoded(html, pid) or woolworths._parse_next_data(html, pid)
+    return r and (r["name"], r["price"], r["was_price"], r["on_special"])
+
+
+def measure(fn, html, pid, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.process_time()
+        fn(html, pid)
+        best = min(best, time.process_time() - t0)
+    tracemalloc.start()
+    fn(html, pid)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--fixtures", type=Path, help="HTTP_RECORD_DIR 录制目录")
+    ap.add_argument("--kb", type=int, default=600, help="合成页面大小（约）")
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+
+    pages = fixture_pages(args.fixtures) if args.fixtures else synthetic_pages(args.kb)
+    if not pages:
+        sys.exit("没有找到 Woolworths 商品页 fixture")
+    for name, pid, html in pages:
+        old, new = legacy(html, pid), streaming(html, pid)
+        print(f"{name}: {len(html) / 1024:.0f} KB  {'一致' if old == new else f'不一致 {old} != {new}'}")
+        # 正确性检查（不计时）：页面上没有的编号不能取到别的商品
+        other = streaming(html, "1")
+        print(f"  编号不符  {'拒绝' if other is None else f'误取 {other}'}")
+        for label, fn in (("整页替换 + 多次扫描", legacy), ("区段定位 + 单次扫描", streaming)):
+            secs, peak = measure(fn, html, pid, args.repeat)
+            print(f"  {label:<20} CPU {secs * 1000:8.2f} ms   峰值 {peak / 1024:8.0f} KB")
+
+
+if __name__ == "__main__":
+    main()
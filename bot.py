@@ -0,0 +1,256 @@
+"""
+Telegram 命令（python monitor.py --bot）：/price <商品>、/best、/history <商品>
+
+长轮询 getUpdates，从内存里的快照索引直接回答，不用等下一次 cron：
+- 索引 = data/prices.json（最新快照）+ 历史 index.json 里每个 (商品, 门店) 最后一次观测的时间；
+  prices.json 的 mtime 一变（cron / 常驻进程写了新快照）就重建
+- 渲染好的回答放在 LRU 里（键是命令 + 解析后的商品名），索引一变就清空；
+  回答里写的是观测时间而不是"几小时前"，缓存的回答不会过时
+- 只有要回答的 (商品, 门店) 比 STALE_HOURS 旧时，才用 monitor 的取价函数实时抓一次，
+  每条命令最多 MAX_LIVE 个；实时结果只留在内存里，不写 prices.json / 历史
+  （快照只由 monitor 自己写，避免和 cron / 常驻进程抢文件）
+
+只回答 TELEGRAM_CHAT_ID（以及 BOT_CHATS，逗号分隔）里的会话；回复走 notify 的发送管道。
+TELEGRAM_API_BASE 可以指向本地的假 Bot API（见 bench/bot.py）。
+"""
+import os
+import time
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+
+import history
+from scraper import client, identity, metrics, notify, record
+
+STALE_HOURS   = float(os.environ.get("BOT_STALE_HOURS", 6))
+LONG_POLL     = 30     # 秒；getUpdates 的 timeout
+CACHE_SIZE    = 256
+MAX_LIVE      = 6      # 每条命令最多实时抓取的 (商品, 门店) 数
+RETRY_AFTER   = 900    # 秒；实时抓取失败的 (商品, 门店) 这么久之内不再重抓
+HISTORY_WEEKS = 8
+STORES        = ("Woolworths", "Coles", "ALDI")
+USAGE = ("用法：\n/price <商品> — 各家当前价格\n/best — 每件商品最便宜的门店\n"
+         f"/history <商品> — 近 {HISTORY_WEEKS} 周价格变化")
+
+_prices: dict = {}     # {商品: {门店: 结果}}
+_seen:   dict = {}     # {(商品, 门店): 观测时间 ISO 字符串}
+_live:   dict = {}     # 实时抓到的：{(商品, 门店): (结果, 观测时间)}
+_failed: dict = {}     # 实时抓取失败的：{(商品, 门店): time.monotonic()}
+_lows:   dict = {}     # 历史最低价（history index 里的 lows）
+_recent: dict | None = None   # 近 HISTORY_WEEKS 周的历史：{(商品, 门店): [[时间, 价格, 原价, 特价], ...]}
+_version = None
+
+
+def allowed_chats() -> set[str]:
+    chats = {os.environ.get("TELEGRAM_CHAT_ID", "")}
+    chats.update(c.strip() for c in os.environ.get("BOT_CHATS", "").split(","))
+    return chats - {""}
+
+
+def refresh(prices_file: Path) -> bool:
+    """prices.json 变了就重建索引并清空 LRU；返回是否重建"""
+    global _prices, _seen, _lows, _recent, _version
+    try:
+        version = prices_file.stat().st_mtime_ns
+    except OSError:
+        version = None
+    if version == _version:
+        return False
+    _prices = record.loads(prices_file.read_text(encoding="utf-8")) if version else {}
+    fallback = datetime.fromtimestamp(version / 1e9).isoformat(timespec="minutes") if version else ""
+    spans = history.spans()
+    _seen = {(item, store): spans.get(f"{item}\t{store}", (None, fallback))[1]
+             for item, stores in _prices.items() for store in stores}
+    # 新快照比实时结果还新的，就不再用实时结果
+    for pair, (_, t) in list(_live.items()):
+        if _seen.get(pair, "") >= t:
+            del _live[pair]
+    _lows    = history.load_index().get("lows", {})
+    _version = version
+    _recent  = None
+    _render.cache_clear()
+    return True
+
+
+def lookup(item: str, store: str) -> tuple[dict | None, str]:
+    """(结果, 观测时间)；实时结果优先"""
+    if (item, store) in _live:
+        return _live[(item, store)]
+    return (_prices.get(item) or {}).get(store), _seen.get((item, store), "")
+
+
+def stale(observed: str, now: datetime | None = None) -> bool:
+    if not observed:
+        return True
+    age = ((now or datetime.now()) - datetime.fromisoformat(observed)).total_seconds()
+    return age > STALE_HOURS * 3600
+
+
+def resolve(query: str, watchlist: list) -> dict | None:
+    """商品名精确 / 包含匹配，再按词元打分（商品名 + 各家的搜索词）"""
+    q = identity.key(query)
+    for item in watchlist:
+        if identity.key(item["name"]) == q:
+            return item
+    for item in watchlist:
+        if q in identity.key(item["name"]):
+            return item
+    text = lambda i: " ".join(filter(None, (i["name"], i.get("coles_query"), i.get("aldi_keyword"))))
+    return identity.best(query, watchlist, text)[0]
+
+
+def answer(updates: list, watchlist: list, fetch, stores_of, chats: set) -> int:
+    """回复一批 update 里的命令（其它消息、别的会话忽略）；返回下一次 getUpdates 的 offset"""
+    offset = None
+    for u in updates:
+        offset = u["update_id"] + 1
+        msg    = u.get("message") or {}
+        chat   = str((msg.get("chat") or {}).get("id", ""))
+        if not msg.get("text", "").startswith("/") or chat not in chats:
+            continue
+        print(f"[{datetime.now():%H:%M}] {chat}: {msg['text']}")
+        notify.send(handle(msg["text"], watchlist, fetch, stores_of), chat_id=chat)
+    return offset
+
+
+def handle(text: str, watchlist: list, fetch, stores_of) -> str:
+    """
+    一条命令的回答。fetch(items, only) 是 monitor.fetch_prices 的包装，
+    stores_of(item) 是 watchlist 条目涉及的门店
+    """
+    cmd, _, arg = (text or "").strip().partition(" ")
+    cmd, arg    = cmd.split("@")[0].lower(), arg.strip()
+    if cmd in ("/price", "/history"):
+        if not arg:
+            return USAGE
+        item = resolve(arg, watchlist)
+        if item is None:
+            return f"没有找到「{arg}」，watchlist 里有：{', '.join(i['name'] for i in watchlist)}"
+        if cmd == "/price":
+            _ensure_fresh([item], fetch, stores_of)
+        return _cached(cmd, item["name"], tuple(stores_of(item)))
+    if cmd == "/best":
+        _ensure_fresh(watchlist, fetch, stores_of)
+        return _cached(cmd, "", tuple((i["name"], tuple(stores_of(i))) for i in watchlist))
+    return USAGE
+
+
+def _cached(cmd: str, name: str, stores: tuple) -> str:
+    hits = _render.cache_info().hits
+    text = _render(cmd, name, stores)
+    metrics.count("bot", "cache_hit" if _render.cache_info().hits > hits else "cache_miss")
+    return text
+
+
+def _ensure_fresh(items: list, fetch, stores_of):
+    """过期的 (商品, 门店) 实时抓一次（最多 MAX_LIVE 个）；抓到了就清空 LRU"""
+    now  = datetime.now()
+    due  = [(i["name"], s) for i in items for s in stores_of(i)
+            if stale(lookup(i["name"], s)[1], now)
+            and time.monotonic() - _failed.get((i["name"], s), -RETRY_AFTER) >= RETRY_AFTER]
+    only = set(due[:MAX_LIVE])
+    if not only:
+        return
+    print(f"  [bot] {len(only)} 个 (商品, 门店) 超过 {STALE_HOURS:g} 小时，实时抓取")
+    metrics.count("bot", "live_fetch", len(only))
+    found = fetch([i for i in items if any((i["name"], s) in only for s in STORES)], only)
+    t = now.isoformat(timespec="minutes")
+    for name, store in only:
+        if r := (found.get(name) or {}).get(store):
+            _live[(name, store)] = (r, t)
+            _failed.pop((name, store), None)
+        else:
+            _failed[(name, store)] = time.monotonic()
+    _render.cache_clear()
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _render(cmd: str, name: str, stores: tuple) -> str:
+    if cmd == "/price":
+        return _render_price(name, stores)
+    if cmd == "/history":
+        return _render_history(name, stores)
+    return _render_best(stores)
+
+
+def _fmt(r: dict, observed: str) -> str:
+    tag  = " 🏷️特价" if r.get("on_special") else ""
+    was  = f" ~~${r['was_price']:.2f}~~" if r.get("was_price") else ""
+    unit = f" (${r['unit_price']:.2f}/{r['unit']})" if r.get("unit_price") is not None else ""
+    return f"*${r['price']:.2f}*{was}{unit}{tag}  _{observed[5:16].replace('T', ' ')}_"
+
+
+def _render_price(name: str, stores: tuple) -> str:
+    lines = [f"🛒 *{name}*"]
+    found = [(s, *lookup(name, s)) for s in stores]
+    best  = min((r["price"] for _, r, _ in found if r and r.get("price") is not None), default=None)
+    for store, r, observed in found:
+        if not r or r.get("price") is None:
+            lines.append(f"{store}: ❌ 暂无价格")
+            continue
+        mark = " ✅" if r["price"] == best else ""
+        lines.append(f"{store}: {_fmt(r, observed)}{mark}")
+    return "\n".join(lines)
+
+
+def _render_best(items: tuple) -> str:
+    lines = ["🏆 *当前最便宜*"]
+    for name, stores in items:
+        found = [(s, *lookup(name, s)) for s in stores]
+        found = [(s, r, t) for s, r, t in found if r and r.get("price") is not None]
+        if not found:
+            lines.append(f"• {name} — ❌ 暂无价格")
+            continue
+        store, r, observed = min(found, key=lambda f: f[1]["price"])
+        lines.append(f"• {name} — {store} {_fmt(r, observed)}")
+    return "\n".join(lines)
+
+
+def _window() -> dict:
+    """第一次 /history 时把近 HISTORY_WEEKS 周的历史读进内存（每个快照版本只读一遍）"""
+    global _recent
+    if _recent is None:
+        since   = datetime.fromtimestamp(time.time() - HISTORY_WEEKS * 7 * 86400).isoformat(timespec="minutes")
+        _recent = {}
+        for t, item, store, *rest in history.rows(since):
+            _recent.setdefault((item, store), []).append([t, *rest])
+    return _recent
+
+
+def _render_history(name: str, stores: tuple) -> str:
+    lines = [f"📈 *{name}* 近 {HISTORY_WEEKS} 周"]
+    for store in stores:
+        rows = _window().get((name, store))
+        if not rows:
+            lines.append(f"{store}: 暂无记录")
+            continue
+        prices  = [p for _, p, *_ in rows]
+        changes = [r for n, r in enumerate(rows) if n == 0 or r[1] != rows[n - 1][1]]
+        low     = _lows.get(f"{name}\t{store}")
+        lines.append(f"*{store}*  ${min(prices):.2f} – ${max(prices):.2f}"
+                     + (f"（历史最低 ${low:.2f}）" if low is not None else ""))
+        lines.append("  " + " → ".join(f"{t[5:10]} ${p:.2f}{'🏷️' if special else ''}"
+                                       for t, p, _, special in changes[-6:]))
+    return "\n".join(lines)
+
+
+def poll(offset: int | None) -> list | None:
+    """一次 getUpdates 长轮询；失败返回 None"""
+    token  = os.environ["TELEGRAM_BOT_TOKEN"]
+    params = {"timeout": LONG_POLL, "allowed_updates": '["message"]'}
+    if offset is not None:
+        params["offset"] = offset
+    try:
+        r = client.get("Telegram", f"{notify.API_BASE}/bot{token}/getUpdates",
+                       params=params, timeout=LONG_POLL + 10)
+        data = r.json()
+    except Exception as e:
+        print(f"  [bot] getUpdates 失败: {e}")
+        return None
+    if not data.get("ok"):
+        print(f"  [bot] getUpdates 失败: {data.get('description', r.status_code)}")
+        if r.status_code == 429:
+            # client 不替 Telegram 重试 429：按 retry_after 等够再回去轮询
+            time.sleep(min(notify._error(r)[1], notify.MAX_RETRY_AFTER))
+        return None
+    return data["result"]
@@ -0,0 +1,116 @@
+"""
+Woolworths 特价目录爬虫（main.py 用）
+
+按页走 Specials 分类接口（/apis/ui/browse/category），复用 scraper/woolworths.py 的
+cloudscraper 会话和 Carnegie North 门店 cookie。翻页是生成器：同时在途的页数不超过
+CONCURRENCY，结果按页序产出；每条记录一产出就追加写进 JSONL 快照，整份目录从不
+同时放在内存里。快照写完（生成器耗尽）且没有任何一页失败才替换掉上一份；失败的页号
+记进调用方传入的 failed 列表，main.py 据此也不提交索引。
+"""
+import json
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from scraper import client, ratelimit
+from scraper.woolworths import _BASE_HEADERS, _COOKIES, _from_api
+
+SNAPSHOT_FILE = Path("storage/woolworths_specials.jsonl")
+CATEGORY_URL  = "https://www.woolworths.com.au/apis/ui/browse/category"
+PAGE_SIZE     = 36     # 接口单页上限
+CONCURRENCY   = 3      # 同时在途的页数
+RATE, BURST   = 1.0, 2 # 次/秒，突发上限
+MAX_PAGES     = 500    # 防止接口给出离谱的 TotalRecordCount
+
+
+def _page_body(page: int) -> dict:
+    return {
+        "categoryId":  "specialsgroup",
+        "pageNumber":  page,
+        "pageSize":    PAGE_SIZE,
+        "sortType":    "TraderRelevance",
+        "url":         "/shop/browse/specials",
+        "location":    "/shop/browse/specials",
+        "formatObject": '{"name":"Specials"}',
+        "isSpecial":   True,
+        "isBundle":    False,
+        "isMobile":    False,
+        "filters":     [],
+        "groupEdmVariants": True,
+        "categoryVersion":  "v2",
+    }
+
+
+def _fetch_page(page: int) -> tuple[list[dict] | None, int]:
+    """(本页记录, 总条数)；失败返回 (None, 0)"""
+    try:
+        r = client.post("Woolworths", CATEGORY_URL, json=_page_body(page),
+                        headers={**_BASE_HEADERS, "Content-Type": "application/json"}, cookies=_COOKIES)
+        if r.status_code != 200:
+            print(f"    [WW specials] 第 {page} 页 HTTP {r.status_code}")
+            return None, 0
+        data = r.json()
+    except Exception as e:
+        print(f"    [WW specials] 第 {page} 页异常: {e}")
+        return None, 0
+    records = []
+    for bundle in data.get("Bundles") or []:
+        for p in bundle.get("Products") or []:
+            if (res := _from_api(p)) and p.get("Stockcode"):
+                records.append({"id": str(p["Stockcode"]), "name": res["name"], "price": res["price"],
+                                "was_price": res["was_price"], "unit_price": res["unit_price"],
+                                "unit": res["unit"], "on_special": res["on_special"]})
+    return records, int(data.get("TotalRecordCount") or 0)
+
+
+def iter_specials(concurrency: int = CONCURRENCY, failed: list | None = None):
+    """
+    逐条产出特价商品；第 1 页拿到总数后，其余页最多 concurrency 页同时在途。
+    取不到的页号追加到 failed（第 1 页失败时不知道总页数，直接结束）。
+    """
+    failed = [] if failed is None else failed
+    first, total = _fetch_page(1)
+    if first is None:
+        failed.append(1)
+        return
+    yield from first
+    pages = min(MAX_PAGES, -(-total // PAGE_SIZE))
+    if pages <= 1:
+        return
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="ww-specials") as pool:
+        window, nxt = [], 2
+        while window or nxt <= pages:
+            while nxt <= pages and len(window) < concurrency:
+                window.append((nxt, pool.submit(_fetch_page, nxt)))
+                nxt += 1
+            page, future = window.pop(0)
+            records, _ = future.result()
+            if records is None:
+                failed.append(page)
+                continue
+            yield from records
+
+
+def get_woolworths_deals(out: Path = SNAPSHOT_FILE, failed: list | None = None):
+    """
+    逐条产出特价记录，同时写入 out 的临时文件；完整走完且没有失败的页才替换 out，
+    否则上一份快照保持不变，失败的页号留在 failed 里给调用方判断。
+    同一 Stockcode 出现在多页时只保留第一次。
+    """
+    failed = [] if failed is None else failed
+    ratelimit.configure("Woolworths", RATE, BURST, (0.1, 0.4))
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp  = out.with_suffix(".tmp")
+    seen = set()
+    with tmp.open("w", encoding="utf-8") as f:
+        for rec in iter_specials(failed=failed):
+            if rec["id"] in seen:
+                continue
+            seen.add(rec["id"])
+            f.write(json.dumps(rec, ensure_ascii=False, separators=(",", ":")) + "\n")
+            yield rec
+    if failed:
+        tmp.unlink()
+        print(f"特价目录第 {', '.join(map(str, sorted(failed)))} 页没取到，保留上一份快照 {out}")
+        return
+    tmp.replace(out)
+    print(f"特价目录 {len(seen)} 件，已写入 {out}")
@@ -0,0 +1,119 @@
+"""
+常驻模式（python monitor.py --daemon）的轮询间隔
+
+每个 (商品, 门店) 有自己的间隔：这次价格变了，间隔减半（不低于 MIN_INTERVAL）；
+没变就乘以 BACKOFF（不超过 MAX_INTERVAL）。第一次见到的序列按历史里最近
+SEED_WEEKS 周的变价次数估初值：平均每两次变价之间轮询 POLLS_PER_CHANGE 次
+（没有历史的用 DEFAULT_INTERVAL）。
+常变价的商品几小时查一次，几个月不动的一天一次。
+
+间隔表保存在 data/daemon.json（时间用 epoch 秒），重启后接着用。
+"""
+import json
+import signal
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import history
+
+STATE_FILE       = Path("data/daemon.json")
+MIN_INTERVAL     = 3600        # 秒
+MAX_INTERVAL     = 24 * 3600
+BACKOFF          = 1.5
+SEED_WEEKS       = 4
+POLLS_PER_CHANGE = 4
+DEFAULT_INTERVAL = 8 * 3600    # 没有历史的序列：和原来一天三次 cron 相当
+MAX_SLEEP        = 300         # 秒；至少这么久醒一次，重读 watchlist、检查每日汇总
+
+_stop = threading.Event()
+
+
+def _key(item: str, store: str) -> str:
+    return f"{item}\t{store}"
+
+
+def _clamp(seconds: float) -> float:
+    return max(MIN_INTERVAL, min(MAX_INTERVAL, seconds))
+
+
+def _seed(keys: set[str]) -> dict[str, float]:
+    """按最近 SEED_WEEKS 周的变价次数估初始间隔；一次扫描历史，不逐个序列查询"""
+    since = (datetime.now() - timedelta(weeks=SEED_WEEKS)).isoformat(timespec="minutes")
+    last, changes, samples = {}, dict.fromkeys(keys, 0), dict.fromkeys(keys, 0)
+    for _, item, store, price, *_ in history.rows(since):
+        key = _key(item, store)
+        if key in changes:
+            if last.get(key, price) != price:
+                changes[key] += 1
+            last[key] = price
+            samples[key] += 1
+    span = SEED_WEEKS * 7 * 24 * 3600
+    return {k: _clamp(span / (n + 1) / POLLS_PER_CHANGE) if samples[k] > 1 else DEFAULT_INTERVAL
+            for k, n in changes.items()}
+
+
+def load(pairs, now: float | None = None) -> dict:
+    """{序列: {"interval", "next"}}，只保留 pairs 里的序列；新序列立即到期"""
+    now = now or time.time()
+    try:
+        state = json.loads(STATE_FILE.read_text(encoding="utf-8"))
+    except Exception:
+        state = {}
+    return sync(state, pairs, now)
+
+
+def sync(state: dict, pairs, now: float | None = None) -> dict:
+    """watchlist 改动后对齐：删掉已移除的序列，给新序列估初值"""
+    now  = now or time.time()
+    keys = {_key(item, store) for item, store in pairs}
+    if new := keys - state.keys():
+        for key, interval in _seed(new).items():
+            state[key] = {"interval": round(interval), "next": now}
+    return {k: v for k, v in state.items() if k in keys}
+
+
+def due(state: dict, now: float | None = None) -> set[tuple[str, str]]:
+    now = now or time.time()
+    return {tuple(k.split("\t", 1)) for k, s in state.items() if s["next"] <= now}
+
+
+def update(state: dict, item: str, store: str, old: dict | None, new: dict | None,
+           now: float | None = None):
+    """一次抓取之后调整间隔；没抓到就按原间隔再排一次"""
+    now = now or time.time()
+    s   = state[_key(item, store)]
+    if new and old and new.get("price") != old.get("price"):
+        s["interval"] = round(_clamp(s["interval"] / 2))
+    elif new:
+        s["interval"] = round(_clamp(s["interval"] * BACKOFF))
+    s["next"] = now + s["interval"]
+
+
+def next_wake(state: dict, now: float | None = None) -> float:
+    now = now or time.time()
+    return max(0.0, min([s["next"] - now for s in state.values()] + [MAX_SLEEP]))
+
+
+def save(state: dict):
+    STATE_FILE.parent.mkdir(exist_ok=True)
+    STATE_FILE.write_text(json.dumps(state, ensure_ascii=False, indent=1, sort_keys=True),
+                          encoding="utf-8")
+
+
+# ── 退出 ──────────────────────────────────────────────────────────────────────
+
+def install_signals():
+    """SIGTERM / SIGINT 时在当前一轮结束后退出，不打断正在写的文件"""
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda *_: _stop.set())
+
+
+def stopped() -> bool:
+    return _stop.is_set()
+
+
+def sleep(seconds: float) -> bool:
+    """睡到下一个序列到期；收到退出信号时提前返回 True"""
+    return _stop.wait(seconds)
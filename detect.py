@@ -0,0 +1,123 @@
+"""
+基于历史的价格变动检测（NumPy 批量计算）
+
+monitor.detect_changes 先按 alert_threshold 和上次价格比较，这里再用近 LOW_WEEKS 周
+的历史把所有 (商品, 门店) 序列装进一个 (序列 × 时间) 矩阵，一次算出：
+  - 窗口最低价 / 中位价（基线）、相对基线的涨跌幅
+  - 是否创 N 周新低、是否创历史新低（历史最低价来自 history 索引，不读全部分段）
+然后：
+  - 价格只是回到近期常态价（来回跳动）的提醒被压掉
+  - 变动没过阈值、但创了 N 周新低 / 历史新低的，补发提醒
+  - 每条提醒都带上 baseline / pct_vs_baseline / window_low / all_time_low 字段
+"""
+import warnings
+from datetime import datetime, timedelta
+
+import numpy as np
+
+import history
+
+LOW_WEEKS   = 8    # 检测窗口（周）
+MIN_SAMPLES = 6    # 窗口内至少这么多次观测，才判断"来回跳动"
+
+
+def load_window(keys: list, since: str):
+    """读取 since 之后的历史，返回 (时间列表, 价格矩阵)，缺失为 NaN 并已前向填充"""
+    row_of = {k: n for n, k in enumerate(keys)}
+    cols, entries = {}, []
+    for t, item, store, price, *_ in history.rows(since=since):
+        n = row_of.get((item, store))
+        if n is not None:
+            entries.append((n, cols.setdefault(t, len(cols)), price))
+    times  = sorted(cols)
+    remap  = np.empty(len(cols), dtype=np.intp)
+    remap[[cols[t] for t in times]] = np.arange(len(times))
+    matrix = np.full((len(keys), len(times)), np.nan)
+    if entries:
+        r, c, p = np.array(entries).T
+        matrix[r.astype(np.intp), remap[c.astype(np.intp)]] = p
+    return times, ffill(matrix)
+
+
+def ffill(matrix: np.ndarray) -> np.ndarray:
+    """按行前向填充 NaN（压缩过的分段只保留变化点，中间的观测等于上一个值）"""
+    if matrix.size == 0:
+        return matrix
+    idx = np.where(np.isnan(matrix), 0, np.arange(matrix.shape[1]))
+    np.maximum.accumulate(idx, axis=1, out=idx)
+    return matrix[np.arange(matrix.shape[0])[:, None], idx]
+
+
+def analyse(past: np.ndarray, current: np.ndarray, hist_low: np.ndarray) -> dict:
+    """
+    past: (S, T) 窗口内历史；current: (S,) 本次价格；hist_low: (S,) 历史最低（可为 NaN）
+    全部按列向量一次算完，返回每个字段一个 (S,) 数组。
+    """
+    S = len(current)
+    with warnings.catch_warnings(), np.errstate(invalid="ignore", divide="ignore"):
+        warnings.simplefilter("ignore", RuntimeWarning)    # 全 NaN 行
+        if past.shape[1]:
+            win_min  = np.nanmin(past, axis=1)
+            baseline = np.nanmedian(past, axis=1)
+        else:
+            win_min = baseline = np.full(S, np.nan)
+        samples = (~np.isnan(past)).sum(axis=1)
+        pct     = (current - baseline) / baseline
+    return {
+        "window_min":   win_min,
+        "baseline":     baseline,
+        "pct":          pct,
+        "samples":      samples,
+        "window_low":   current < win_min,
+        "all_time_low": current < hist_low,
+    }
+
+
+def enrich(alerts: list, old: dict, new: dict, thresholds: dict,
+           weeks: int = LOW_WEEKS, now: datetime | None = None) -> list:
+    keys = [(item, store) for item, stores in new.items()
+            for store, r in stores.items() if r and r.get("price") is not None]
+    if not keys:
+        return alerts
+    now     = now or datetime.now()
+    since   = (now - timedelta(weeks=weeks)).isoformat(timespec="minutes")
+    current = np.array([new[i][s]["price"] for i, s in keys], dtype=float)
+    lows    = history.load_index().get("lows", {})
+    hist_lo = np.array([lows.get(f"{i}\t{s}", np.nan) for i, s in keys], dtype=float)
+    thr     = np.array([thresholds.get(i, 0.10) for i, _ in keys], dtype=float)
+
+    _, past = load_window(keys, since)
+    st = analyse(past, current, hist_lo)
+
+    # 回到近期常态价：过了阈值但离基线不到一个阈值，视为来回跳动
+    flip_flop = (st["samples"] >= MIN_SAMPLES) & (np.abs(current - st["baseline"]) < thr)
+    new_low   = st["window_low"] | st["all_time_low"]
+
+    by_key  = {(a["item"], a["store"]): a for a in alerts}
+    pos     = {k: n for n, k in enumerate(keys)}
+    alerted = np.zeros(len(keys), dtype=bool)
+    alerted[[pos[k] for k in by_key if k in pos]] = True
+    out = []
+    for n in np.flatnonzero(new_low | alerted):
+        item, store = keys[n]
+        a = by_key.get((item, store))
+        if a and flip_flop[n] and not new_low[n]:
+            continue
+        if a is None:
+            op = old.get(item, {}).get(store, {}).get("price")
+            if op is None or current[n] >= op:
+                continue
+            data = new[item][store]
+            a = {"item": item, "store": store, "branch": data.get("branch", ""),
+                 "old_price": op, "new_price": float(current[n]),
+                 "change": round(float(current[n]) - op, 2),
+                 "on_special": data.get("on_special", False)}
+        a.update({
+            "baseline":        None if np.isnan(st["baseline"][n]) else round(float(st["baseline"][n]), 2),
+            "pct_vs_baseline": None if np.isnan(st["pct"][n]) else round(float(st["pct"][n]), 4),
+            "window_weeks":    weeks,
+            "window_low":      bool(st["window_low"][n]),
+            "all_time_low":    bool(st["all_time_low"][n]),
+        })
+        out.append(a)
+    return out
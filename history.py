@@ -0,0 +1,179 @@
+"""
+价格历史：按月分段的只追加 JSONL（data/history/YYYY-MM.jsonl）
+
+每行一次观测：[时间, 商品, 门店, 价格, 原价, 是否特价]，每次运行只在当月分段末尾追加，
+git 里每次提交只多几行。index.json 记录每个分段包含哪些 (商品, 门店) 及其在该分段的
+首次时间（分段的时间范围就是它的月份），按范围查询时只打开相关分段。index.json 里还
+维护每个序列的历史最低价（lows），判断"历史最低"时不必读全部分段。这两样只在出现新
+序列 / 新低价时才变，普通的一次运行不会改动 index.json。
+
+每次都变的每个序列首末时间（bot 判断数据新旧用）放在 spans.json：不进 git，
+不存在时从分段重建一次。
+
+最新快照仍然是 data/prices.json（O(商品数)），load_prices / detect_changes 只读它。
+compact() 把已结束月份的分段压缩为"只保留变化点 + 每个序列最后一条"，每个分段只压一次。
+"""
+import json
+from datetime import datetime
+from pathlib import Path
+
+HISTORY_DIR = Path("data/history")
+INDEX_FILE  = HISTORY_DIR / "index.json"
+SPANS_FILE  = HISTORY_DIR / "spans.json"
+
+
+def _key(item: str, store: str) -> str:
+    return f"{item}\t{store}"
+
+
+def load_index() -> dict:
+    if not INDEX_FILE.exists():
+        return {"segments": {}}
+    index = json.loads(INDEX_FILE.read_text(encoding="utf-8"))
+    for meta in index["segments"].values():
+        # 旧格式：分段带 first / last / rows，序列带 [首, 末]
+        for k in ("first", "last", "rows"):
+            meta.pop(k, None)
+        meta["series"] = {key: v[0] if isinstance(v, list) else v for key, v in meta["series"].items()}
+    return index
+
+
+def _save_index(index: dict):
+    HISTORY_DIR.mkdir(parents=True, exist_ok=True)
+    INDEX_FILE.write_text(json.dumps(index, ensure_ascii=False, indent=1, sort_keys=True),
+                          encoding="utf-8")
+
+
+def append(snapshot: dict, ts: str | None = None):
+    """把一次快照 {商品: {门店: 结果}} 追加到当月分段"""
+    ts  = ts or datetime.now().isoformat(timespec="minutes")
+    seg = ts[:7]
+    rows = [
+        [ts, item, store, r["price"], r.get("was_price"), bool(r.get("on_special"))]
+        for item, stores in snapshot.items()
+        for store, r in stores.items() if r and r.get("price") is not None
+    ]
+    if not rows:
+        return
+    HISTORY_DIR.mkdir(parents=True, exist_ok=True)
+    with (HISTORY_DIR / f"{seg}.jsonl").open("a", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+    index   = load_index()
+    series  = index["segments"].setdefault(seg, {"series": {}})["series"]
+    lows    = index.setdefault("lows", {})
+    spans   = _load_spans()
+    changed = False
+    for _, item, store, price, *_ in rows:
+        key = _key(item, store)
+        if key not in series:
+            series[key], changed = ts, True
+        if key not in lows or price < lows[key]:
+            lows[key], changed = price, True
+        span = spans.setdefault(key, [ts, ts])
+        span[1] = max(span[1], ts)
+    if changed:
+        _save_index(index)
+    _save_spans(spans)
+
+
+def spans() -> dict:
+    """{"商品\t门店": [首次时间, 最后一次时间]}"""
+    return _load_spans()
+
+
+def _load_spans() -> dict:
+    try:
+        return json.loads(SPANS_FILE.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        pass
+    out = {}
+    for seg in sorted(load_index()["segments"]):
+        for t, item, store, *_ in _read(seg):
+            span = out.setdefault(_key(item, store), [t, t])
+            span[1] = max(span[1], t)
+    if out:
+        _save_spans(out)
+    return out
+
+
+def _save_spans(spans: dict):
+    HISTORY_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = SPANS_FILE.with_suffix(".tmp")
+    tmp.write_text(json.dumps(spans, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+    tmp.replace(SPANS_FILE)
+
+
+def _segments(index: dict, since: str | None, until: str | None, key: str | None = None):
+    for seg, meta in sorted(index["segments"].items()):
+        if (since and seg < since[:7]) or (until and seg > until[:7]):
+            continue
+        if key and (key not in meta["series"] or (until and meta["series"][key] > until)):
+            continue
+        yield seg
+
+
+def _read(seg: str):
+    path = HISTORY_DIR / f"{seg}.jsonl"
+    if not path.exists():
+        return
+    with path.open(encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def rows(since: str | None = None, until: str | None = None):
+    """按时间顺序产出范围内的所有观测行"""
+    for seg in _segments(load_index(), since, until):
+        for row in _read(seg):
+            if (not since or row[0] >= since) and (not until or row[0] <= until):
+                yield row
+
+
+def query(item: str, store: str, since: str | None = None, until: str | None = None) -> list:
+    """某个 (商品, 门店) 在时间范围内的 [时间, 价格, 原价, 特价] 列表"""
+    key = _key(item, store)
+    out = []
+    for seg in _segments(load_index(), since, until, key):
+        for t, i, s, price, was, special in _read(seg):
+            if i == item and s == store and (not since or t >= since) and (not until or t <= until):
+                out.append([t, price, was, special])
+    return out
+
+
+def lowest(item: str, store: str, since: str | None = None) -> float | None:
+    if not since:
+        return load_index().get("lows", {}).get(_key(item, store))
+    prices = [r[1] for r in query(item, store, since)]
+    return min(prices) if prices else None
+
+
+def compact(now: datetime | None = None) -> int:
+    """压缩已结束月份的分段，返回本次压缩的分段数"""
+    current = (now or datetime.now()).strftime("%Y-%m")
+    index   = load_index()
+    done    = 0
+    for seg, meta in sorted(index["segments"].items()):
+        if seg >= current or meta.get("compacted"):
+            continue
+        data = list(_read(seg))
+        kept, last_seen, prev = [], {}, {}
+        for n, row in enumerate(data):
+            key = _key(row[1], row[2])
+            if prev.get(key) != row[3:]:
+                kept.append(n)
+            prev[key] = row[3:]
+            last_seen[key] = n
+        keep = sorted(set(kept) | set(last_seen.values()))
+        tmp  = HISTORY_DIR / f"{seg}.jsonl.tmp"
+        with tmp.open("w", encoding="utf-8") as f:
+            for n in keep:
+                f.write(json.dumps(data[n], ensure_ascii=False, separators=(",", ":")) + "\n")
+        tmp.replace(HISTORY_DIR / f"{seg}.jsonl")
+        meta["compacted"] = True
+        done += 1
+    if done:
+        _save_index(index)
+    return done
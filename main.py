@@ -1,5 +1,5 @@
 import os
-import json
+import sqlite3
 from datetime import datetime
 from telegram import Bot
 
@@ -10,46 +10,53 @@ CHAT_ID = os.environ["CHAT_ID"]
 
 bot = Bot(token=BOT_TOKEN)
 
-DATA_FILE = "storage/data.json"
+INDEX_FILE = "storage/woolworths_index.sqlite"
 
 
-def load_db():
-    if not os.path.exists(DATA_FILE):
-        return {}
-    with open(DATA_FILE, "r") as f:
-        return json.load(f)
-
-
-def save_db(data):
+def open_index():
+    """上一份特价快照的索引（id → 名称、价格），放在 sqlite 里逐条查，不整份读进内存"""
     os.makedirs("storage", exist_ok=True)
-
-    with open(DATA_FILE, "w") as f:
-        json.dump(data, f)
-
-
-def detect_price_drop(new_data, old_data, threshold=0.2):
+    db = sqlite3.connect(INDEX_FILE)
+    db.execute("CREATE TABLE IF NOT EXISTS prices (id TEXT PRIMARY KEY, name TEXT, price REAL)")
+    db.execute("DROP TABLE IF EXISTS incoming")
+    db.execute("CREATE TABLE incoming (id TEXT PRIMARY KEY, name TEXT, price REAL)")
+    return db
+
+
+def commit_index(db):
+    """本次目录完整走完后，用 incoming 表替换上一份快照"""
+    with db:
+        db.execute("DROP TABLE prices")
+        db.execute("ALTER TABLE incoming RENAME TO prices")
+    db.close()
+
+
+def detect_price_drop(records, db, threshold=0.2):
+    """
+    逐条消费特价记录流，和上一份快照比较，同时写进 incoming 表。
+    第一次运行（没有上一份快照）不发"新商品"提醒，否则整份目录都是新商品。
+    """
     alerts = []
+    first_run = db.execute("SELECT 1 FROM prices LIMIT 1").fetchone() is None
 
-    for product, price in new_data.items():
-
-        try:
-            price_float = float(price.replace("$", ""))
-
-            if product in old_data:
-                old_price = float(old_data[product].replace("$", ""))
+    for rec in records:
+        product, price_float = rec["name"], rec["price"]
+        db.execute("INSERT OR REPLACE INTO incoming VALUES (?, ?, ?)",
+                   (rec["id"], product, price_float))
+        row = db.execute("SELECT price FROM prices WHERE id = ?", (rec["id"],)).fetchone()
 
-                if old_price > price_float * (1 + threshold):
-                    alerts.append(
-                        f"⬇️ 降价 {product}\n"
-                        f"原价 ${old_price}\n"
-                        f"现价 ${price_float}"
-                    )
+        if row:
+            old_price = row[0]
 
-            else:
-                alerts.append(f"🆕 新商品 {product} - ${price_float}")
+            if old_price > price_float * (1 + threshold):
+                alerts.append(
+                    f"⬇️ 降价 {product}\n"
+                    f"原价 ${old_price:.2f}\n"
+                    f"现价 ${price_float:.2f}"
+                )
 
-        except:
-            continue
+        elif not first_run:
+            alerts.append(f"🆕 新商品 {product} - ${price_float:.2f}")
 
     return alerts
 
@@ -57,10 +64,15 @@ def detect_price_drop(new_data, old_data, threshold=0.2):
 def main():
     print("开始终极稳定版抓取")
 
-    old_db = load_db()
-    new_db = get_woolworths_deals()
+    db = open_index()
+    failed = []
+    alerts = detect_price_drop(get_woolworths_deals(failed=failed), db)
 
-    alerts = detect_price_drop(new_db, old_db)
+    if failed:
+        # 目录不完整：不发提醒、不提交索引，下次完整走完再和同一份旧快照比较
+        print(f"有 {len(failed)} 页没取到，本次不提醒、不更新索引")
+        db.close()
+        return
 
     if alerts:
         message = "🛒 Carnegie 超市特价监控\n\n"
@@ -69,7 +81,7 @@ def main():
 
         bot.send_message(chat_id=CHAT_ID, text=message)
 
-    save_db(new_db)
+    commit_index(db)
 
 
 if __name__ == "__main__":
@@ -1,52 +1,146 @@
 #!/usr/bin/env python3
 """Carnegie 3163 超市价格监控"""
-import json, time, random
+import argparse, json, os, subprocess, sys, time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from pathlib import Path
 
-from scraper.woolworths import get_price as ww_get
-from scraper.coles      import get_price as coles_get
-from scraper.aldi       import get_price as aldi_get
-from scraper.notify     import send, price_change_message, daily_summary_message
+from scraper.notify     import send, flush, price_change_message, daily_summary_message
+from scraper            import breaker, httpcache, identity, metrics, ratelimit, record, registry, strategy
+import bot, daemon, history, scheduler, shard
 
 WATCHLIST_FILE = Path("watchlist.json")
 PRICES_FILE    = Path("data/prices.json")
 
+# 每家门店：并发线程数 / 令牌桶速率（次/秒）/ 突发上限 / 每次请求附加的随机抖动（秒）
+STORE_LIMITS = {
+    "Woolworths": {"concurrency": 2, "rate": 0.6, "burst": 1, "jitter": (0.2, 0.8)},
+    "Coles":      {"concurrency": 2, "rate": 0.6, "burst": 1, "jitter": (0.2, 0.8)},
+    "ALDI":       {"concurrency": 1, "rate": 1.0, "burst": 1, "jitter": (0.1, 0.5)},
+}
+
+# (门店, 日志标签, 取价函数, 批量取价函数, 从 watchlist 条目里取参数)；
+# 爬虫模块在取价函数第一次被调用时才导入，见 scraper/registry.py
+STORES = registry.table()
+
 def load_watchlist(): return json.loads(WATCHLIST_FILE.read_text(encoding="utf-8"))
 def load_prices():
-    return json.loads(PRICES_FILE.read_text(encoding="utf-8")) if PRICES_FILE.exists() else {}
-def save_prices(p):
+    return record.loads(PRICES_FILE.read_text(encoding="utf-8")) if PRICES_FILE.exists() else {}
+def save_prices(p, observed=None):
+    """
+    prices.json 只保存最新快照（供下次对比，PriceRecord 的紧凑编码，见 scraper/record.py）；
+    本次实际抓到的 observed（默认即 p）追加到 data/history/，沿用旧价的商品不会被当成新观测写进历史
+    """
     PRICES_FILE.parent.mkdir(exist_ok=True)
-    PRICES_FILE.write_text(json.dumps(p, indent=2, ensure_ascii=False), encoding="utf-8")
-
-def fetch_prices(watchlist):
-    snapshot = {}
-    for item in watchlist:
-        name, stores = item["name"], {}
-        print(f"\n  → {name}")
-        if ww_id := item.get("woolworths_id"):
-            r = ww_get(ww_id)
-            if r:
-                stores["Woolworths"] = r
-                print(f"    WW:    ${r['price']:.2f}{'🏷️' if r.get('on_special') else ''}  ({r['source']})")
-            else: print("    WW:    ❌ 无法获取")
-            time.sleep(random.uniform(1.0, 2.5))
-        if q := item.get("coles_query"):
-            r = coles_get(q)
-            if r:
-                stores["Coles"] = r
-                print(f"    Coles: ${r['price']:.2f}{'🏷️' if r.get('on_special') else ''}  ({r['source']})")
-            else: print("    Coles: ❌ 无法获取")
-            time.sleep(random.uniform(1.0, 2.5))
-        if item.get("monitor_aldi") and (kw := item.get("aldi_keyword")):
-            r = aldi_get(kw)
-            if r:
-                stores["ALDI"] = r
-                print(f"    ALDI:  ${r['price']:.2f}")
-            else: print("    ALDI:  ❌ 无法获取")
-            time.sleep(random.uniform(0.5, 1.5))
-        snapshot[name] = stores
-    return snapshot
+    PRICES_FILE.write_text(record.dumps(p), encoding="utf-8")
+    history.append(p if observed is None else observed)
+
+def _store_limits():
+    """STORE_LIMITS，可用环境变量 FETCH_LIMITS (JSON) 按门店覆盖部分字段"""
+    limits = {k: dict(v) for k, v in STORE_LIMITS.items()}
+    for store, cfg in json.loads(os.environ.get("FETCH_LIMITS") or "{}").items():
+        limits.setdefault(store, {}).update(cfg)
+    return limits
+
+def _log(prefix, label, r):
+    if r: print(f"{prefix}{label} ${r['price']:.2f}{'🏷️' if r.get('on_special') else ''}  ({r['source']})")
+    else: print(f"{prefix}{label} ❌ 无法获取")
+
+def _safe_get(get, *args, **kwargs):
+    try: return get(*args, **kwargs)
+    except Exception as e:
+        print(f"    [{get.__module__}] 未处理异常: {e}")
+        return None
+
+_SKIPPED = object()   # 截止时间已到，没有发起抓取
+
+def fetch_prices(watchlist, concurrent=True, deadline=None, on_item=None, only=None):
+    """
+    concurrent=True 时三家门店并行抓取，每家门店一个线程池；
+    请求节奏由各门店的令牌桶控制（见 scraper/ratelimit.py）。
+    deadline（time.monotonic() 口径）之后不再发起新的抓取，没抓完的商品不出现在返回值里；
+    on_item(name, stores) 在一件商品所有门店都抓完时调用（scheduler 用它写检查点）。
+    only 是 {(商品, 门店)} 时只抓这些组合（常驻模式按各自的间隔轮询）。
+    """
+    limits = _store_limits()
+    for store, cfg in limits.items():
+        ratelimit.configure(store, cfg["rate"], cfg.get("burst", 1), cfg.get("jitter", (0.0, 0.0)))
+    expired = lambda: deadline is not None and time.monotonic() >= deadline
+    wanted  = lambda name, store: only is None or (name, store) in only
+
+    jobs = [(item["name"], store, label, get, arg)
+            for item in watchlist
+            for store, label, get, batch, key in STORES
+            if (arg := key(item)) and not batch and wanted(item["name"], store)]
+    # 有批量接口的门店整张 watchlist 一次查完，和其它门店并行
+    batches = [(store, label, batch, [(i["name"], arg) for i in watchlist
+                                      if (arg := key(i)) and wanted(i["name"], store)])
+               for store, label, _, batch, key in STORES if batch]
+    remaining = Counter(name for name, *_ in jobs)
+    remaining.update(name for *_, pairs in batches for name, _ in pairs)
+    results, skipped = {}, set()
+
+    def assemble(name):
+        return {store: r for store, *_ in STORES if (r := results.get((name, store)))}
+
+    def done(name, store, r, label, prefix):
+        if r is _SKIPPED:
+            skipped.add(name)
+        else:
+            results[(name, store)] = r
+            _log(prefix, label, r)
+        remaining[name] -= 1
+        if remaining[name] == 0 and name not in skipped and on_item:
+            on_item(name, assemble(name))
+
+    def run(get, arg):
+        return _SKIPPED if expired() else _safe_get(get, arg)
+
+    def run_batch(batch, args):
+        if expired():
+            return _SKIPPED
+        found = _safe_get(batch, args, should_stop=expired) or {}
+        # 批量途中到了截止时间：没拿到的 ID 算跳过，而不是失败
+        return {a: found.get(str(a), _SKIPPED if expired() else None) for a in args}
+
+    if concurrent:
+        pools = {store: ThreadPoolExecutor(max_workers=limits[store]["concurrency"],
+                                           thread_name_prefix=store)
+                 for store, *_ in STORES}
+        try:
+            futures = {pools[store].submit(run, get, arg): (name, store, label)
+                       for name, store, label, get, arg in jobs}
+            futures.update({pools[store].submit(run_batch, batch, [a for _, a in pairs]): (pairs, store, label)
+                            for store, label, batch, pairs in batches if pairs})
+            for fut in as_completed(futures):
+                key, store, label = futures[fut]
+                if isinstance(key, list):
+                    found = fut.result()
+                    for name, arg in key:
+                        done(name, store, found if found is _SKIPPED else found[arg], label, f"  {name}  ")
+                else:
+                    done(key, store, fut.result(), label, f"  {key}  ")
+        finally:
+            for pool in pools.values(): pool.shutdown(wait=True, cancel_futures=True)
+    else:
+        for store, label, batch, pairs in batches:
+            if pairs:
+                print(f"\n  → {store} 批量 {len(pairs)} 件")
+                found = run_batch(batch, [a for _, a in pairs])
+                for name, arg in pairs:
+                    done(name, store, found if found is _SKIPPED else found[arg], label, f"  {name}  ")
+        current = None
+        for name, store, label, get, arg in jobs:
+            if name != current:
+                print(f"\n  → {name}"); current = name
+            done(name, store, run(get, arg), label, "    ")
+
+    if skipped:
+        print(f"\n⏱️ 到达截止时间，{len(skipped)} 件商品留到下次运行")
+    # 按传入顺序 / 门店的固定顺序组装
+    return {item["name"]: assemble(item["name"])
+            for item in watchlist if item["name"] not in skipped}
 
 def detect_changes(old, new, watchlist):
     thresholds = {i["name"]: i.get("alert_threshold", 0.10) for i in watchlist}
@@ -60,28 +154,213 @@ def detect_changes(old, new, watchlist):
                 alerts.append({"item": name, "store": store, "branch": data.get("branch",""),
                                 "old_price": op, "new_price": np, "change": change,
                                 "on_special": data.get("on_special", False)})
-    return alerts
+    if not alerts and not new:
+        return alerts
+    # 结合历史：压掉来回跳动，补上 N 周新低 / 历史新低（detect 依赖 NumPy，用到时才导入）
+    import detect
+    return detect.enrich(alerts, old, new, thresholds)
 
-def main():
-    now = datetime.now()
-    print(f"[{now:%Y-%m-%d %H:%M} AEDT] Carnegie 3163 价格监控启动")
+def _basket(prices):
+    """每日汇总用的 (整篮方案, 单价最优)"""
+    import basket   # NumPy，只有发每日汇总时才需要
+    return basket.plans(prices), basket.unit_best(prices)
+
+def _report_breakers():
+    state = breaker.snapshot()
+    metrics.annotate("breakers", state)
+    for host, s in state["hosts"].items():
+        if s["trips"]:
+            print(f"⚡ {host} 本次熔断 {s['trips']} 次，跳过 {s['short_circuited']} 个请求（{s['last_error']}）")
+
+def _pairs(watchlist):
+    return [(i["name"], store) for i in watchlist for store, *_, key in STORES if key(i)]
+
+def run_daemon():
+    """
+    常驻进程：每个 (商品, 门店) 按 daemon.py 里的自适应间隔轮询，
+    会话 / cookie / 各爬虫的缓存在轮与轮之间保持热状态
+    """
+    print("常驻模式启动（SIGTERM / Ctrl-C 在本轮结束后退出）")
+    daemon.install_signals()
+    prices  = load_prices()
+    state   = daemon.load(_pairs(load_watchlist()))
+    summary = None
+    while not daemon.stopped():
+        now       = datetime.now()
+        watchlist = load_watchlist()   # 每轮重读，改 watchlist 不必重启
+        state     = daemon.sync(state, _pairs(watchlist))
+        if due := daemon.due(state):
+            print(f"\n[{now:%Y-%m-%d %H:%M}] 本轮 {len(due)} 个 (商品, 门店) 到期")
+            if registry.loaded("Coles"):
+                registry.module("Coles").new_run()
+            breaker.refill()
+            items   = [i for i in watchlist if any((i["name"], s) in due for s, *_ in STORES)]
+            fetched = fetch_prices(items, concurrent=os.environ.get("FETCH_SERIAL") != "1", only=due)
+            for name, store in due:
+                daemon.update(state, name, store, prices.get(name, {}).get(store),
+                              fetched.get(name, {}).get(store))
+            if alerts := detect_changes(prices, fetched, watchlist):
+                print(f"检测到 {len(alerts)} 条价格变动，发送 Telegram 通知…")
+                send(price_change_message(alerts))
+            prices = {i["name"]: {**prices.get(i["name"], {}), **fetched.get(i["name"], {})}
+                      for i in watchlist}
+            save_prices(prices, observed=fetched)
+            daemon.save(state)
+            strategy.save()
+            identity.save()
+            metrics.write()
+        if now.hour == 8 and summary != now.date():
+            send(daily_summary_message(prices, *_basket(prices)))
+            summary = now.date()
+            if n := history.compact():
+                print(f"压缩了 {n} 个历史分段")
+            httpcache.prune()
+        flush()
+        daemon.sleep(daemon.next_wake(state))
+    _report_breakers()
+    print("常驻模式已退出")
+
+def run_bot():
+    """长轮询 Telegram 命令，从快照索引回答；数据超过 bot.STALE_HOURS 才实时抓取"""
+    print(f"Telegram 命令模式启动（/price /best /history，超过 {bot.STALE_HOURS:g} 小时的数据实时抓取）")
+    daemon.install_signals()
+    chats  = bot.allowed_chats()
+    offset = None
+
+    def live(items, only):
+        if registry.loaded("Coles"):
+            registry.module("Coles").new_run()
+        breaker.refill()
+        return fetch_prices(items, concurrent=False, only=only)
+
+    def stores_of(item):
+        return [store for store, *_, key in STORES if key(item)]
+
+    while not daemon.stopped():
+        updates = bot.poll(offset)
+        if updates is None:
+            daemon.sleep(5)
+            continue
+        if updates:
+            bot.refresh(PRICES_FILE)
+            offset = bot.answer(updates, load_watchlist(), live, stores_of, chats)
+            flush()
+    print("Telegram 命令模式已退出")
+
+def _banner(now, note=""):
+    print(f"[{now:%Y-%m-%d %H:%M} AEDT] Carnegie 3163 价格监控启动{note}")
     print("门店: Woolworths Carnegie North #3298 | Coles Carnegie Central | ALDI Carnegie")
     print("─" * 60)
-    watchlist  = load_watchlist()
-    old_prices = load_prices()
+
+def _fetch(watchlist, schedule):
+    """按调度顺序抓取（带截止时间和检查点），返回 (fetched, 被跳过的商品名)"""
+    resumed = scheduler.load_checkpoint()
+    if resumed:
+        print(f"从检查点恢复 {len(resumed)} 件商品的结果")
+    todo = scheduler.order([i for i in watchlist if i["name"] not in resumed], schedule)
     print("\n正在获取价格…")
-    new_prices = fetch_prices(watchlist)
+    fetched = fetch_prices(todo, concurrent=os.environ.get("FETCH_SERIAL") != "1",
+                           deadline=scheduler.deadline(), on_item=scheduler.checkpoint)
+    fetched = {**resumed, **fetched}
+    return fetched, [i["name"] for i in todo if i["name"] not in fetched]
+
+def _publish(now, watchlist, old_prices, fetched, skipped, schedule):
+    """对比、通知、保存快照和历史、更新调度表"""
+    # 没来得及抓的商品沿用上次的价格，保证 prices.json 里不丢商品
+    new_prices = {i["name"]: fetched.get(i["name"], old_prices.get(i["name"], {})) for i in watchlist}
     print("\n" + "─" * 60)
-    alerts = detect_changes(old_prices, new_prices, watchlist)
+    alerts = detect_changes(old_prices, fetched, watchlist)
     if alerts:
         print(f"检测到 {len(alerts)} 条价格变动，发送 Telegram 通知…")
         send(price_change_message(alerts))
     else:
         print("无价格变动")
     if now.hour == 8:
-        send(daily_summary_message(new_prices))
-    save_prices(new_prices)
+        send(daily_summary_message(new_prices, *_basket(new_prices)))
+    save_prices(new_prices, observed=fetched)
+    scheduler.finish(schedule, fetched, skipped)
+    if n := history.compact():
+        print(f"压缩了 {n} 个历史分段")
+
+def _wrap_up():
+    if left := flush(timeout=120):
+        print(f"⚠️ {left} 条 Telegram 消息留在 outbox，下次运行补发")
+    _report_breakers()
+    if out := metrics.write():
+        print(f"运行报告已写入 {out}/")
     print("✅ 完成！")
 
+def main():
+    now = datetime.now()
+    _banner(now)
+    watchlist = load_watchlist()
+    schedule  = scheduler.load_schedule()
+    fetched, skipped = _fetch(watchlist, schedule)
+    _publish(now, watchlist, load_prices(), fetched, skipped, schedule)
+    _wrap_up()
+
+def run_shard(i, n):
+    """只抓第 i 片的商品，写部分快照；对比、通知、保存留给 run_merge"""
+    _banner(datetime.now(), f"（分片 {i}/{n}）")
+    shard.localise(i, n)
+    watchlist = shard.select(load_watchlist(), i, n)
+    print(f"本片 {len(watchlist)} 件商品")
+    fetched, skipped = _fetch(watchlist, scheduler.load_schedule())
+    shard.write_partial(i, n, fetched, skipped)
+    scheduler.clear_checkpoint()
+    _wrap_up()
+
+def run_merge(n):
+    now = datetime.now()
+    _banner(now, f"（合并 {n} 个分片）")
+    watchlist = load_watchlist()
+    fetched, skipped, missing = shard.merge(n)
+    if missing:
+        # 缺的分片按"本次被跳过"处理：沿用旧价，下次优先抓
+        print(f"⚠️ 缺少分片 {missing} 的结果")
+        skipped += [i["name"] for i in watchlist if shard.shard_of(i["name"], n) in missing]
+    _publish(now, watchlist, load_prices(), fetched, skipped, scheduler.load_schedule())
+    _wrap_up()
+
+def dry_run():
+    """只读 watchlist 和调度表，打印本次会抓什么；不导入爬虫、不发请求、不写文件"""
+    watchlist = load_watchlist()
+    todo      = scheduler.order(watchlist, scheduler.load_schedule())
+    stores    = registry.needed(watchlist)
+    print(f"dry run：{len(watchlist)} 件商品，涉及门店 {', '.join(stores) or '无'}")
+    for item in todo:
+        print(f"  {item['name']}: {', '.join(s for s, *_, key in STORES if key(item)) or '—'}")
+
+def run_workers(n):
+    """本机起 n 个分片进程并行抓取，全部结束后合并"""
+    procs = [subprocess.Popen([sys.executable, os.path.abspath(__file__), "--shard", f"{i}/{n}"])
+             for i in range(n)]
+    for i, p in enumerate(procs):
+        if p.wait():
+            print(f"⚠️ 分片 {i}/{n} 退出码 {p.returncode}")
+    run_merge(n)
+
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Carnegie 3163 超市价格监控")
+    mode   = parser.add_mutually_exclusive_group()
+    mode.add_argument("--daemon", action="store_true", help="常驻运行，按商品自适应间隔轮询")
+    mode.add_argument("--shard", metavar="I/N", type=shard.parse, help="只抓第 I 片（从 0 开始），写部分快照")
+    mode.add_argument("--merge", metavar="N", type=int, help="合并 N 个分片的部分快照，对比并通知")
+    mode.add_argument("--workers", metavar="N", type=int, help="本机 N 个分片进程并行抓取后合并")
+    mode.add_argument("--bot", action="store_true", help="回答 Telegram 命令 /price /best /history")
+    mode.add_argument("--dry-run", action="store_true", help="只打印本次会抓的商品和门店")
+    args = parser.parse_args()
+    if args.dry_run:
+        dry_run()
+    elif args.daemon:
+        run_daemon()
+    elif args.bot:
+        run_bot()
+    elif args.shard:
+        run_shard(*args.shard)
+    elif args.merge:
+        run_merge(args.merge)
+    elif args.workers:
+        run_workers(args.workers)
+    else:
+        main()
@@ -0,0 +1,89 @@
+"""
+带截止时间的运行调度 + 检查点续跑
+
+- 截止时间：RUN_DEADLINE 秒（从进程启动算起），到点前 DEADLINE_MARGIN 秒停止发起新请求，
+  让保存、通知、提交都能在 Actions 的 timeout-minutes 之内完成
+- 顺序：上次因截止时间被跳过的商品优先，其次 watchlist 里的 priority（大的先），
+  最后按上次成功抓取的时间（越旧越先，从没抓过的最先）
+- 检查点：每件商品抓完立即追加一行到 data/checkpoint.jsonl；进程中途被杀，
+  下次运行（CHECKPOINT_TTL 内）直接复用这些结果，只抓剩下的
+- data/schedule.json 记录每件商品上次抓取时间和待补抓列表
+"""
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from scraper import record
+
+CHECKPOINT_FILE = Path("data/checkpoint.jsonl")
+SCHEDULE_FILE   = Path("data/schedule.json")
+CHECKPOINT_TTL  = 6 * 3600   # 秒
+DEADLINE_MARGIN = 30         # 秒
+
+_started = time.monotonic()
+_lock    = threading.Lock()
+
+
+def deadline() -> float | None:
+    """time.monotonic() 口径的截止时间；没设置 RUN_DEADLINE 就不限时"""
+    budget = os.environ.get("RUN_DEADLINE")
+    if not budget:
+        return None
+    return _started + float(budget) - DEADLINE_MARGIN
+
+
+def load_schedule() -> dict:
+    if SCHEDULE_FILE.exists():
+        return json.loads(SCHEDULE_FILE.read_text(encoding="utf-8"))
+    return {"last_fetched": {}, "pending": []}
+
+
+def order(watchlist: list, schedule: dict) -> list:
+    pending = set(schedule.get("pending", []))
+    last    = schedule.get("last_fetched", {})
+    return sorted(watchlist, key=lambda i: (i["name"] not in pending,
+                                            -i.get("priority", 0),
+                                            last.get(i["name"], "")))
+
+
+def load_checkpoint() -> dict:
+    """{商品: {门店: 结果}}，只取 CHECKPOINT_TTL 内写入的行"""
+    if not CHECKPOINT_FILE.exists():
+        return {}
+    done, now = {}, time.time()
+    for line in CHECKPOINT_FILE.read_text(encoding="utf-8").splitlines():
+        try:
+            row = json.loads(line)
+        except ValueError:
+            continue     # 被杀时写了一半的行
+        if now - row["t"] < CHECKPOINT_TTL:
+            done[row["name"]] = {s: record.decode(r) for s, r in row["stores"].items()}
+    return done
+
+
+def checkpoint(name: str, stores: dict):
+    line = json.dumps({"t": time.time(), "name": name,
+                       "stores": {s: record.encode(r) for s, r in stores.items()}}, ensure_ascii=False)
+    with _lock:
+        CHECKPOINT_FILE.parent.mkdir(exist_ok=True)
+        with CHECKPOINT_FILE.open("a", encoding="utf-8") as f:
+            f.write(line + "\n")
+            f.flush()
+
+
+def finish(schedule: dict, fetched, skipped: list):
+    """整次运行正常结束：更新抓取时间和待补抓列表，清掉检查点"""
+    now = datetime.now().isoformat(timespec="minutes")
+    schedule.setdefault("last_fetched", {}).update({name: now for name in fetched})
+    schedule["pending"] = list(skipped)
+    SCHEDULE_FILE.parent.mkdir(exist_ok=True)
+    SCHEDULE_FILE.write_text(json.dumps(schedule, ensure_ascii=False, indent=1, sort_keys=True),
+                             encoding="utf-8")
+    clear_checkpoint()
+
+
+def clear_checkpoint():
+    CHECKPOINT_FILE.unlink(missing_ok=True)
@@ -1,14 +1,27 @@
 """
-ALDI 爬虫 — cloudscraper 版，三重选择器策略
+ALDI 爬虫 — cloudscraper 版，单遍 tile 提取 + 通用兜底
 ALDI 全国统一价，Carnegie Central 和 Glen Huntly 两家价格相同。
+
+分类页只解析商品 tile 子树（SoupStrainer 限制），一遍遍历同时识别
+新版 / 旧版两套选择器，记录每个 tile 命中的是哪一套；装了 lxml 就用 lxml 解析。
+只有 tile 里找不到关键词时，才对整页做一次完整解析跑通用兜底。
+
+同一分类页在一次运行里只下载、解析一次：解析结果建成商品索引
+（name token → 商品），之后同分类的关键词都直接查内存。
+缓存按条数（CACHE_SIZE）和时间（CACHE_TTL）淘汰，长时间运行的进程不会一直拿旧页面。
+
+关键词对应哪个 tile 按词元打分选（scraper/identity.py），不再是"任一词命中的第一个"；
+选中 tile 的商品 ID 记下来，之后直接按 ID 在分类页里取，找不到才重新匹配。
 """
 import re
-import cloudscraper
-from bs4 import BeautifulSoup
+import threading
+import time
+from collections import Counter, OrderedDict
+from importlib.util import find_spec
 
-_scraper = cloudscraper.create_scraper(
-    browser={"browser": "chrome", "platform": "darwin", "mobile": False}
-)
+from bs4 import BeautifulSoup, SoupStrainer
+
+from scraper import client, httpcache, identity, metrics, record
 
 HEADERS = {
     "Accept":          "text/html,application/xhtml+xml,*/*;q=0.8",
@@ -26,6 +39,18 @@ CATEGORY_URLS = {
 
 BRANCH = "Carnegie Central / Glen Huntly (统一价)"
 
+_PRICE_RE = re.compile(r"\$\s*(\d+\.\d{2})")
+_ID_RE    = re.compile(r"(\d{6,})/?$")
+_ID_ATTRS = ("data-product-id", "data-sku", "data-article-number")
+_PARSER   = "lxml" if find_spec("lxml") else "html.parser"
+
+CACHE_SIZE = 8          # 最多缓存几个分类页
+CACHE_TTL  = 30 * 60    # 秒
+
+_cache: "OrderedDict[str, tuple[float, dict]]" = OrderedDict()
+_cache_lock = threading.Lock()
+_url_locks: dict[str, threading.Lock] = {}
+
 
 def get_price(keyword: str) -> dict | None:
     kw_lower     = keyword.lower()
@@ -35,41 +60,172 @@ def get_price(keyword: str) -> dict | None:
         print(f"    [ALDI] 未配置分类 URL: '{keyword}'")
         return None
 
-    try:
-        resp = _scraper.get(category_url, headers=HEADERS, timeout=20)
-        resp.raise_for_status()
-    except Exception as e:
-        print(f"    [ALDI] 请求失败: {e}")
+    page = _category_page(category_url)
+    if page is None:
+        return None
+    return _lookup(page, kw_lower, keyword) or _strategy_generic(_full_soup(page), kw_lower, keyword)
+
+
+# ── 分类页缓存 + 商品索引 ─────────────────────────────────────────────────────
+
+def _category_page(url: str) -> dict | None:
+    with _cache_lock:
+        lock = _url_locks.setdefault(url, threading.Lock())
+    # 同一 URL 并发请求时只有一个线程真正去下载
+    with lock:
+        with _cache_lock:
+            hit = _cache.get(url)
+            if hit and time.monotonic() - hit[0] < CACHE_TTL:
+                _cache.move_to_end(url)
+                metrics.count("ALDI", "page_cache_hit")
+                return hit[1]
+        try:
+            resp = client.get("ALDI", url, headers=HEADERS, cache=True)
+            resp.raise_for_status()
+        except Exception as e:
+            print(f"    [ALDI] 请求失败: {e}")
+            return None
+        # 页面没变（304）时连 tile 提取也跳过
+        page = _build_index(resp.text, httpcache.derived(resp, "aldi_tiles/v1",
+                                                         lambda: _extract_products(resp.text)))
+        with _cache_lock:
+            _cache[url] = (time.monotonic(), page)
+            _cache.move_to_end(url)
+            while len(_cache) > CACHE_SIZE:
+                _cache.popitem(last=False)
+        return page
+
+
+@metrics.timed("ALDI", "extract")
+def _extract_products(html: str) -> dict:
+    """
+    products 按 new → old、文档顺序排列（与原来先跑新版选择器、再跑旧版的优先级一致）；
+    结果只含基本类型，可以存进 HTTP 缓存
+    """
+    new, old, families = [], [], Counter()
+    for card, family in extract_tiles(html):
+        text    = card.get_text(" ", strip=True)
+        price_m = _PRICE_RE.search(text)
+        if not price_m:
+            continue
+        name_el = card.select_one("[class*='name'], [class*='title'], h2, h3")
+        families[family] += 1
+        (new if family == "new" else old).append({
+            "id":       _tile_id(card),
+            "name":     name_el.get_text(strip=True) if name_el else None,
+            "price":    float(price_m.group(1)),
+            "text":     text.lower(),
+            "strategy": family,
+        })
+    return {"products": new + old, "families": dict(families)}
+
+
+def _build_index(html: str, extracted: dict | None = None) -> dict:
+    """tokens 记录每个单词出现在哪些商品里，ids 记录商品 ID 在哪个位置"""
+    extracted = extracted or _extract_products(html)
+    products, tokens, ids = extracted["products"], {}, {}
+    for idx, p in enumerate(products):
+        for word in set(p["text"].split()):
+            tokens.setdefault(word, []).append(idx)
+        if p["id"]:
+            ids.setdefault(p["id"], idx)
+    return {"html": html, "soup": None, "products": products,
+            "tokens": tokens, "ids": ids, "families": Counter(extracted["families"])}
+
+
+def _tile_id(card) -> str | None:
+    """tile 上的商品 ID：data-* 属性，否则商品链接末尾的数字 ID"""
+    for attr in _ID_ATTRS:
+        if val := card.get(attr):
+            return str(val)
+    link = card.find("a", href=True)
+    if link and (m := _ID_RE.search(link["href"].split("?")[0])):
+        return m.group(1)
+    return None
+
+
+def _full_soup(page: dict):
+    """通用兜底需要整页 DOM，按需解析一次并挂在缓存条目上"""
+    if page["soup"] is None:
+        page["soup"] = BeautifulSoup(page["html"], _PARSER)
+    return page["soup"]
+
+
+@metrics.timed("ALDI", "index")
+def _lookup(page, kw_lower, keyword):
+    if (pid := identity.get("ALDI", keyword)) is not None:
+        if (idx := page["ids"].get(pid)) is not None:
+            return _hit(page["products"][idx], keyword, "id")
+        identity.forget("ALDI", keyword)   # 下架或换了 ID：重新匹配
+    kw_words = kw_lower.split()
+    hits = sorted({i for w in kw_words for i in page["tokens"].get(w, ())})
+    if hits:
+        p, match = identity.best(keyword, (page["products"][i] for i in hits), lambda p: p["text"])
+        if p is None:
+            return None
+        if p["id"]:
+            identity.remember("ALDI", keyword, p["id"], p["name"] or keyword, match)
+        return _hit(p, keyword)
+    # 整词没命中时退回子串匹配（与原来 `w in text` 的语义一致）
+    p = next((p for p in page["products"] if any(w in p["text"] for w in kw_words)), None)
+    return _hit(p, keyword) if p else None
+
+
+def _hit(p, keyword, via=None):
+    metrics.count("ALDI", f"win_{via or p['strategy']}")
+    return _build(p["name"] or keyword, p["price"], p["strategy"], p["text"])
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
+
+
+# ── 单遍 tile 提取 ────────────────────────────────────────────────────────────
+
+def _classes(attrs) -> str:
+    cls = attrs.get("class") or ""
+    return " ".join(cls) if isinstance(cls, list) else cls
+
+
+def _family(name, attrs) -> str | None:
+    """
+    新版（2024 年后）：li.ft-product-tile, li/div[class*=product-tile], article[class*=tile]
+    旧版：div.tile--product, div.product-item, div[data-module=product], li[class*=item]
+    """
+    if name not in ("li", "div", "article"):
         return None
+    cls = _classes(attrs)
+    if (name == "article" and "tile" in cls) or (name != "article" and "product-tile" in cls):
+        return "new"
+    words = cls.split()
+    if name == "div" and ("tile--product" in words or "product-item" in words
+                          or attrs.get("data-module") == "product"):
+        return "old"
+    if name == "li" and "item" in cls:
+        return "old"
+    return None
 
-    soup = BeautifulSoup(resp.text, "html.parser")
 
-    # 三重策略，任意命中就返回
-    return (
-        _strategy_new(soup, kw_lower, keyword)
-        or _strategy_old(soup, kw_lower, keyword)
-        or _strategy_generic(soup, kw_lower, keyword)
-    )
+def _is_tile(name, attrs=None) -> bool:
+    if hasattr(name, "attrs"):          # 少数路径下 bs4 直接传入 Tag
+        name, attrs = name.name, name.attrs
+    return _family(name, attrs or {}) is not None
 
 
-def _strategy_new(soup, kw_lower, keyword):
-    """新版 ALDI tile 结构（2024 年后）"""
-    cards = soup.select(
-        "li.ft-product-tile, li[class*='product-tile'], "
-        "div[class*='product-tile'], article[class*='tile']"
-    )
-    return _match(cards, kw_lower, keyword, "new")
+_TILE_STRAINER = SoupStrainer(_is_tile)
 
 
-def _strategy_old(soup, kw_lower, keyword):
-    """旧版 ALDI 结构"""
-    cards = soup.select(
-        "div.tile--product, div.product-item, "
-        "div[data-module='product'], li[class*='item']"
-    )
-    return _match(cards, kw_lower, keyword, "old")
+def extract_tiles(html: str):
+    """只解析 tile 子树，一遍遍历产出 (tile, 选择器家族)，嵌套 tile 也会各自产出"""
+    soup = BeautifulSoup(html, _PARSER, parse_only=_TILE_STRAINER)
+    for tag in soup.find_all(True):
+        family = _family(tag.name, tag.attrs)
+        if family:
+            yield tag, family
 
 
+@metrics.timed("ALDI", "generic")
 def _strategy_generic(soup, kw_lower, keyword):
     """
     通用兜底：找包含关键词的任意块级元素里的 $x.xx 价格。
@@ -83,39 +239,18 @@ def _strategy_generic(soup, kw_lower, keyword):
         text = container.get_text(" ", strip=True)
         if len(text) > 600 or not any(w in text.lower() for w in kw_words):
             continue
-        price_m = re.search(r"\$\s*(\d+\.\d{2})", text)
+        price_m = _PRICE_RE.search(text)
         if price_m:
             name_el = container.select_one("h2, h3, [class*='name'], [class*='title']")
             return _build(
                 name_el.get_text(strip=True) if name_el else keyword,
                 float(price_m.group(1)),
                 "generic",
+                text,
             )
     return None
 
 
-def _match(cards, kw_lower, keyword, strategy):
-    kw_words = kw_lower.split()
-    for card in cards:
-        text = card.get_text(" ", strip=True)
-        if not any(w in text.lower() for w in kw_words):
-            continue
-        price_m = re.search(r"\$\s*(\d+\.\d{2})", text)
-        if not price_m:
-            continue
-        name_el = card.select_one("[class*='name'], [class*='title'], h2, h3")
-        name    = name_el.get_text(strip=True) if name_el else keyword
-        return _build(name, float(price_m.group(1)), strategy)
-    return None
-
-
-def _build(name, price, source):
-    return {
-        "store":      "ALDI",
-        "branch":     BRANCH,
-        "name":       name,
-        "price":      price,
-        "was_price":  None,
-        "on_special": False,
-        "source":     source,
-    }
+def _build(name, price, source, text=""):
+    """ALDI 没有单独的单价字段：从商品块文字里找 "$0.33 per 100 g" 这样的单价"""
+    return record.build("ALDI", BRANCH, name, price, source=source, unit_text=record.find_unit(text))
@@ -0,0 +1,103 @@
+"""
+按主机的熔断器 + 全局重试预算
+
+发往某个主机的请求连续 FAILURE_THRESHOLD 次失败（超时、5xx、429、403/挑战页）后熔断。
+一次请求的重试都用尽才算一次失败，单个不稳定的请求不会把整个主机熔断。
+熔断后发往该主机的请求直接抛 CircuitOpen，不再等 15–25 秒超时，其它门店照常跑完。
+熔断 COOLDOWN 秒后放行一个试探请求（半开），成功即恢复；一次 cron 运行里
+通常就是"本次运行不再请求该主机"。
+
+重试由 client 负责（指数退避 + 抖动），每次重试都要从整次运行共享的
+RETRY_BUDGET 里扣一次，预算用完就不再重试。
+"""
+import os
+import threading
+import time
+
+FAILURE_THRESHOLD = int(os.environ.get("BREAKER_THRESHOLD", 3))
+COOLDOWN          = float(os.environ.get("BREAKER_COOLDOWN", 900))
+RETRY_BUDGET      = int(os.environ.get("HTTP_RETRY_BUDGET", 20))
+
+
+class CircuitOpen(Exception):
+    def __init__(self, host: str):
+        super().__init__(f"{host} 已熔断，跳过请求")
+        self.host = host
+
+
+_lock  = threading.Lock()
+_hosts: dict[str, dict] = {}
+_retries_left = RETRY_BUDGET
+
+
+def _state(host: str) -> dict:
+    return _hosts.setdefault(host, {"state": "closed", "failures": 0, "trips": 0,
+                                    "short_circuited": 0, "opened_at": None, "last_error": None})
+
+
+def check(host: str):
+    """请求前调用；熔断中抛 CircuitOpen，冷却期过了转为半开放行一次"""
+    with _lock:
+        s = _state(host)
+        if s["state"] == "closed":
+            return
+        if s["state"] == "open" and time.monotonic() - s["opened_at"] >= COOLDOWN:
+            s["state"] = "half_open"
+            return
+        s["short_circuited"] += 1
+        raise CircuitOpen(host)
+
+
+def success(host: str):
+    with _lock:
+        s = _state(host)
+        s["state"], s["failures"] = "closed", 0
+
+
+def failure(host: str, reason: str):
+    with _lock:
+        s = _state(host)
+        s["failures"]  += 1
+        s["last_error"] = reason
+        if s["state"] == "half_open" or (s["state"] == "closed" and s["failures"] >= FAILURE_THRESHOLD):
+            s["state"], s["opened_at"] = "open", time.monotonic()
+            s["trips"] += 1
+            print(f"    [breaker] {host} 连续 {s['failures']} 次请求失败，熔断（{reason}）")
+
+
+def is_open(host: str) -> bool:
+    """熔断中或半开（正在试探）：都不该再重试"""
+    with _lock:
+        return _state(host)["state"] != "closed"
+
+
+def take_retry() -> bool:
+    """从全局预算里取一次重试机会"""
+    global _retries_left
+    with _lock:
+        if _retries_left <= 0:
+            return False
+        _retries_left -= 1
+        return True
+
+
+def refill():
+    """重置重试预算（常驻模式每一轮一份），熔断状态保留"""
+    global _retries_left
+    with _lock:
+        _retries_left = RETRY_BUDGET
+
+
+def snapshot() -> dict:
+    with _lock:
+        return {
+            "retry_budget": {"total": RETRY_BUDGET, "left": _retries_left},
+            "hosts": {h: {k: v for k, v in s.items() if k != "opened_at"} for h, s in _hosts.items()},
+        }
+
+
+def reset():
+    global _retries_left
+    with _lock:
+        _hosts.clear()
+        _retries_left = RETRY_BUDGET
@@ -0,0 +1,179 @@
+"""
+共享 HTTP 客户端：三家爬虫和 Telegram 通知都从这里发请求。
+
+- session 按门店懒创建：watchlist 只涉及一家门店时，只建一个 session，
+  cloudscraper 也只在第一次需要时才导入
+- 每个 session 的连接池大小 / keep-alive / 超时 / 重试都在这里统一设置，
+  可用环境变量 HTTP_POOL_SIZE / HTTP_KEEP_ALIVE / HTTP_TIMEOUT / HTTP_RETRIES 覆盖
+- 每次请求前走该门店的令牌桶（scraper/ratelimit.py）和该主机的熔断器（scraper/breaker.py）；
+  超时、5xx、429 按指数退避 + 抖动重试，每次重试消耗全局重试预算；
+  CALLER_HANDLES 里的状态码（Telegram 的 429）原样交给调用方
+- 录制 / 回放（HTTP_RECORD_DIR / HTTP_REPLAY，见 scraper/replay.py）也在这一层
+- get(..., cache=True) 走磁盘缓存和条件请求（scraper/httpcache.py），用于大页面
+"""
+import os
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+from scraper import breaker, httpcache, metrics, ratelimit, replay, sessions
+
+POOL_SIZE  = int(os.environ.get("HTTP_POOL_SIZE", 4))
+KEEP_ALIVE = os.environ.get("HTTP_KEEP_ALIVE", "1") != "0"
+TIMEOUT    = float(os.environ.get("HTTP_TIMEOUT", 20))
+RETRIES    = int(os.environ.get("HTTP_RETRIES", 2))
+BACKOFF    = 1.0    # 第 n 次重试最多等 BACKOFF * 2**n 秒（全抖动）
+MAX_WAIT   = 30.0
+
+_RETRY_STATUS = (429, 500, 502, 503, 504)
+
+# 门店 → cookie 域名；None 表示普通 requests session（不需要过 Cloudflare）
+PROFILES = {
+    "Woolworths": "woolworths.com.au",
+    "Coles":      "coles.com.au",
+    "ALDI":       "aldi.com.au",
+    "Telegram":   None,
+}
+TIMEOUTS = {"Telegram": 10}
+# 调用方自己处理的状态码：client 不重试、也不算熔断失败，原样返回
+# （Telegram 的 429 要按 parameters.retry_after 等，见 notify._deliver）
+CALLER_HANDLES = {"Telegram": (429,)}
+
+_lock = threading.Lock()
+_sessions: dict = {}
+
+
+def session(store: str):
+    with _lock:
+        s = _sessions.get(store)
+        if s is None:
+            s = _sessions[store] = _create(store)
+        return s
+
+
+def get(store: str, url: str, **kwargs):
+    return request(store, "GET", url, **kwargs)
+
+
+def post(store: str, url: str, **kwargs):
+    return request(store, "POST", url, **kwargs)
+
+
+def request(store: str, method: str, url: str, cache: bool = False, **kwargs):
+    """熔断中抛 breaker.CircuitOpen；重试用尽后返回最后一个响应或抛出最后一个异常"""
+    if cache and method == "GET":
+        k     = httpcache.key(url, kwargs.get("params"))
+        entry = httpcache.lookup(k)
+        if entry and httpcache.fresh(entry):
+            metrics.count(store, "http_cache_fresh")
+            return httpcache.response(k, entry, url)
+        if entry:
+            kwargs["headers"] = {**(kwargs.get("headers") or {}), **httpcache.validators(entry)}
+        return httpcache.settle(k, request(store, method, url, **kwargs), entry, url, store)
+    kwargs.setdefault("timeout", TIMEOUTS.get(store, TIMEOUT))
+    host = urlsplit(url).netloc
+    for attempt in range(RETRIES + 1):
+        breaker.check(host)
+        ratelimit.acquire(store)
+        resp, err = _send(store, method, url, kwargs)
+        reason = _failure_reason(store, resp, err)
+        if reason is None:
+            breaker.success(host)
+            return resp
+        # 每次尝试的结果只用来决定是否重试；熔断器按整个请求计一次失败（重试用尽后）
+        if (attempt == RETRIES or not _retryable(resp, err)
+                or breaker.is_open(host) or not breaker.take_retry()):
+            break
+        metrics.count(store, "retry")
+        time.sleep(_backoff(attempt, resp))
+    breaker.failure(host, reason)
+    if err is not None:
+        raise err
+    return resp
+
+
+def _send(store, method, url, kwargs):
+    t0 = time.perf_counter()
+    try:
+        resp = session(store).request(method, replay.rewrite(url), **kwargs)
+    except Exception as e:
+        metrics.record(store, "http", time.perf_counter() - t0, False, error=True)
+        return None, e
+    if metrics.enabled():
+        metrics.record(store, "http", time.perf_counter() - t0, resp.ok)
+        metrics.observe_bytes(store, len(resp.content))
+        metrics.count(store, f"http_{resp.status_code}")
+    replay.record(method, resp)
+    return resp, None
+
+
+def _failure_reason(store, resp, err) -> str | None:
+    """熔断器眼里的失败：异常、5xx、429、403 / 挑战页；404（商品不存在）、CALLER_HANDLES 之类不算"""
+    if err is not None:
+        return type(err).__name__
+    if resp.status_code in CALLER_HANDLES.get(store, ()):
+        return None
+    if sessions.is_challenge(resp):
+        return "challenge"
+    if resp.status_code in _RETRY_STATUS or resp.status_code == 403:
+        return f"HTTP {resp.status_code}"
+    return None
+
+
+def _retryable(resp, err) -> bool:
+    # 挑战页 / 403 重试没有意义（cloudscraper 已经在内部尝试过）
+    return err is not None or resp.status_code in _RETRY_STATUS
+
+
+def _backoff(attempt: int, resp) -> float:
+    retry_after = resp is not None and resp.headers.get("Retry-After")
+    if retry_after and retry_after.isdigit():
+        return min(float(retry_after), MAX_WAIT)
+    return random.uniform(0, min(MAX_WAIT, BACKOFF * 2 ** attempt))
+
+
+def configure(pool_size=None, keep_alive=None, timeout=None, retries=None):
+    """修改全局设置；只影响之后新建的 session"""
+    global POOL_SIZE, KEEP_ALIVE, TIMEOUT, RETRIES
+    POOL_SIZE  = POOL_SIZE  if pool_size  is None else pool_size
+    KEEP_ALIVE = KEEP_ALIVE if keep_alive is None else keep_alive
+    TIMEOUT    = TIMEOUT    if timeout    is None else timeout
+    RETRIES    = RETRIES    if retries    is None else retries
+
+
+def close():
+    with _lock:
+        for s in _sessions.values():
+            s.close()
+        _sessions.clear()
+
+
+def _create(store: str):
+    domain = PROFILES.get(store)
+    if domain:
+        import cloudscraper
+        s = cloudscraper.create_scraper(
+            browser={"browser": "chrome", "platform": "darwin", "mobile": False}
+        )
+    else:
+        import requests
+        s = requests.Session()
+    _tune(s)
+    if domain:
+        sessions.restore(s, domain)
+    return s
+
+
+def _tune(s):
+    """
+    调整已挂载的 adapter，而不是换成新的 HTTPAdapter ——
+    cloudscraper 的 https adapter 带着自定义 TLS 指纹，换掉就过不了 Cloudflare。
+    重试不交给 urllib3，由 request() 统一处理（要经过熔断器和重试预算）。
+    """
+    for prefix in ("https://", "http://"):
+        adapter = s.get_adapter(prefix)
+        adapter._pool_connections = POOL_SIZE
+        adapter._pool_maxsize     = POOL_SIZE
+        adapter.init_poolmanager(POOL_SIZE, POOL_SIZE)
+    s.headers["Connection"] = "keep-alive" if KEEP_ALIVE else "close"
@@ -6,20 +6,41 @@ Coles 的商品搜索 API BASE_URL 会轮换，无法永久硬编码。
   1. 读缓存的有效 URL（data/coles_api_url.txt）
   2. 缓存失效时，从搜索页 HTML 里动态解析当前 API URL
   3. 最后兜底：直接用 www.coles.com.au 主域
+
+一次运行内：相同查询只请求一次；每次搜索取 PAGE_SIZE 条，后续查询若能在
+已拿到的结果里完整命中就不再请求；URL 重新发现最多一次。
+storeId 是否被接受会记在 data/coles_state.json（STATE_TTL 内有效）。
+
+搜索结果按词元打分选最佳匹配（scraper/identity.py），选中的商品 ID 记下来，
+之后的运行直接按 ID 取价，取不到才重新搜索。
 """
 import re
 import json
+import threading
+import time
 from pathlib import Path
-import cloudscraper
-from bs4 import BeautifulSoup
+
+from scraper import client, httpcache, identity, metrics, record, strategy
 
 STORE_ID   = "7724"   # Coles Carnegie Central
 CACHE_FILE = Path("data/coles_api_url.txt")
+STATE_FILE = Path("data/coles_state.json")
+STATE_TTL  = 3 * 24 * 3600   # 秒
+# 带 storeId 的请求返回这些以外的 4xx 才算 storeId 被拒；超时、5xx、熔断、限流都只是这次没成功
+_NOT_REJECTION = {401, 403, 407, 408, 429}
+PAGE_SIZE  = 20
 _API_PATH  = "/api/2.0/market/products"
+_SEARCH_PAGE = "https://www.coles.com.au/search?q=milk"
 
-_scraper = cloudscraper.create_scraper(
-    browser={"browser": "chrome", "platform": "darwin", "mobile": False}
-)
+# 本次运行的状态
+_lock          = threading.Lock()
+_discover_lock = threading.Lock()
+_query_locks: dict[str, threading.Lock] = {}
+_results: dict[str, dict | None] = {}
+_seen: list[dict] = []
+_state: dict | None = None
+_base_url: str | None = None
+_rediscovered = False
 
 BASE_HEADERS = {
     "Accept":          "application/json, text/plain, */*",
@@ -30,113 +51,297 @@ BASE_HEADERS = {
 
 
 def get_price(query: str) -> dict | None:
+    key = " ".join(query.lower().split())
+    with _lock:
+        qlock = _query_locks.setdefault(key, threading.Lock())
+    # 同一次运行里相同的 coles_query 只查一次（并发时后到的线程等结果）
+    with qlock:
+        if key in _results:
+            metrics.count("Coles", "dedupe_hit")
+        else:
+            _results[key] = _by_id(query) or _from_seen(query) or _lookup(query)
+        return _results[key]
+
+
+@metrics.timed("Coles", "by_id")
+def _by_id(query: str) -> dict | None:
+    """身份索引里有这个查询的商品 ID：直接取该商品，不再搜索"""
+    pid = identity.get("Coles", query)
+    if not pid or not (base_url := _get_base_url()):
+        return None
+    item = _request_product(base_url, pid)
+    if item is False:
+        # 商品下架或换了 ID：忘掉，本次走搜索重新匹配
+        print(f"    [Coles] 商品 {pid} 已不存在，重新搜索 '{query}'")
+        identity.forget("Coles", query)
+        return None
+    return _to_result(item, query, "api_id") if item else None
+
+
+def _lookup(query: str) -> dict | None:
     base_url = _get_base_url()
     if not base_url:
         return None
 
-    result = _fetch(base_url, query, store_id=STORE_ID)
-    if result:
-        return result
+    results = _search(base_url, query)
+    if results is None and _rediscover():
+        # URL 可能已轮换：整次运行最多重新发现一次
+        base_url = _get_base_url()
+        results  = _search(base_url, query) if base_url else None
 
-    # storeId 可能无效，不带 storeId 再试一次
-    result = _fetch(base_url, query, store_id=None)
-    if result:
-        return result
+    if not results:
+        return None
+    item, match = identity.best(query, results, _candidate_name)
+    if item and item.get("id"):
+        identity.remember("Coles", query, str(item["id"]), item.get("name", ""), match)
+    # 没有达到匹配分数线时仍按原来取第一条，但不记入身份索引
+    return _to_result(item or results[0], query)
 
-    # URL 可能已轮换，强制刷新再试
-    print(f"    [Coles] URL 可能失效，重新发现...")
-    CACHE_FILE.unlink(missing_ok=True)
-    base_url = _get_base_url(force=True)
-    if base_url:
-        return _fetch(base_url, query, store_id=None)
 
-    return None
+def _candidate_name(item: dict) -> str:
+    return f"{item.get('brand', '')} {item.get('name', '')}"
+
+
+def _search(base_url: str, query: str) -> list | None:
+    """
+    先带 storeId 查，再不带 storeId 查（和原来一样），但记住 storeId 是否被接受：
+    一旦确认被拒（带 storeId 的请求明确返回 4xx，不带的成功），本次运行（以及
+    STATE_TTL 内的后续运行）直接跳过带 storeId 的请求。
+    返回 None 表示请求本身失败，[] 表示没有结果。
+    """
+    with_store, status, tried = None, None, _store_id_ok() is not False
+    if tried:
+        with_store, status = _request(base_url, query, store_id=STORE_ID)
+        if with_store:
+            _remember_store_id(True)
+            return with_store
+        metrics.count("Coles", "store_id_retry")
+
+    without, _ = _request(base_url, query, store_id=None)
+    if (tried and with_store is None and without is not None
+            and status and 400 <= status < 500 and status not in _NOT_REJECTION):
+        print(f"    [Coles] storeId 被拒（HTTP {status}），之后不再带 storeId")
+        _remember_store_id(False)
+    return without if without is not None else with_store
 
 
-def _fetch(base_url: str, query: str, store_id: str | None) -> dict | None:
+def _request(base_url: str, query: str, store_id: str | None) -> tuple[list | None, int | None]:
+    """(结果, HTTP 状态码)；请求失败时结果是 None，没拿到响应（超时、熔断等）时状态码也是 None"""
     url    = base_url.rstrip("/") + _API_PATH
-    params = {"q": query, "page": 1, "pageSize": 5}
+    params = {"q": query, "page": 1, "pageSize": PAGE_SIZE}
     if store_id:
         params["storeId"] = store_id
+    strategy = "search_store_id" if store_id else "search"
+    t0 = time.perf_counter()
     try:
-        resp = _scraper.get(url, headers=BASE_HEADERS, params=params, timeout=20)
+        resp = client.get("Coles", url, headers=BASE_HEADERS, params=params)
         if resp.status_code not in (200, 201):
+            metrics.record("Coles", strategy, time.perf_counter() - t0, False)
+            return None, resp.status_code
+        results = resp.json().get("results", [])
+    except Exception as e:
+        print(f"    [Coles] 请求异常: {e}")
+        metrics.record("Coles", strategy, time.perf_counter() - t0, False, error=True)
+        return None, None
+    metrics.record("Coles", strategy, time.perf_counter() - t0, bool(results))
+    with _lock:
+        _seen.extend(results)
+    return results, resp.status_code
+
+
+def _request_product(base_url: str, pid: str) -> dict | bool | None:
+    """按 ID 取单个商品；商品不存在返回 False，请求失败返回 None"""
+    url    = f"{base_url.rstrip('/')}{_API_PATH}/{pid}"
+    params = {"storeId": STORE_ID} if _store_id_ok() is not False else {}
+    try:
+        resp = client.get("Coles", url, headers=BASE_HEADERS, params=params)
+        if resp.status_code == 404:
+            return False
+        if resp.status_code != 200:
             return None
-        data    = resp.json()
-        results = data.get("results", [])
-        if not results:
-            return None
-        item    = results[0]
-        pricing = item.get("pricing", {})
-        price   = pricing.get("now") or item.get("price")
-        if not price:
-            return None
-        return {
-            "store":      "Coles",
-            "branch":     "Carnegie Central",
-            "name":       item.get("name", query),
-            "price":      float(price),
-            "was_price":  pricing.get("was"),
-            "unit":       pricing.get("unit", {}).get("ofMeasurePrice", ""),
-            "on_special": pricing.get("promotionType") is not None,
-            "source":     "api",
-        }
+        data = resp.json()
     except Exception as e:
         print(f"    [Coles] 请求异常: {e}")
         return None
+    item = (data.get("results") or [None])[0] if "results" in data else data
+    return item if item and str(item.get("id", pid)) == pid else False
+
+
+def _to_result(item: dict, query: str, source: str = "api") -> record.PriceRecord | None:
+    pricing = item.get("pricing") or {}
+    price   = pricing.get("now") or item.get("price")
+    if not price:
+        return None
+    # ofMeasurePrice 有时是数字（配 ofMeasureQuantity / ofMeasureUnits），有时直接是 "$1.00 per 1ea"
+    unit    = pricing.get("unit") or {}
+    per     = unit.get("ofMeasurePrice")
+    measure = ((per, unit.get("ofMeasureQuantity"), unit.get("ofMeasureUnits"))
+               if isinstance(per, (int, float)) else None)
+    text    = pricing.get("comparable") or (per if isinstance(per, str) else "")
+    return record.build("Coles", "Carnegie Central", item.get("name", query), float(price),
+                        was_price=pricing.get("was"),
+                        on_special=pricing.get("promotionType") is not None,
+                        source=source, unit_text=text, measure=measure)
+
+
+def new_run():
+    """常驻模式每一轮开始时调用：清掉上一轮的查询结果，保留已发现的 URL 和 storeId 状态"""
+    global _rediscovered
+    with _lock:
+        _results.clear()
+        _seen.clear()
+        _rediscovered = False
+
+
+# ── 本次运行内的复用 ──────────────────────────────────────────────────────────
+
+def _tokens(text: str) -> set[str]:
+    return set(re.findall(r"[a-z0-9]+", text.lower()))
+
+
+@metrics.timed("Coles", "shared")
+def _from_seen(query: str) -> dict | None:
+    """
+    之前的搜索结果（pageSize 条）里商品名包含查询全部词的候选，和 _lookup 一样按
+    identity.best 打分取最佳；达到 MIN_SCORE 才复用（并记入身份索引），否则照常搜索
+    """
+    want = _tokens(query)
+    if not want:
+        return None
+    with _lock:
+        seen = [item for item in _seen if want <= _tokens(_candidate_name(item))]
+    item, match = identity.best(query, seen, _candidate_name)
+    if not item or not (r := _to_result(item, query, "api_shared")):
+        return None
+    if item.get("id"):
+        identity.remember("Coles", query, str(item["id"]), item.get("name", ""), match)
+    return r
 
 
-def _get_base_url(force: bool = False) -> str | None:
-    if not force and CACHE_FILE.exists():
-        cached = CACHE_FILE.read_text().strip()
-        if cached:
-            return cached
-    url = _discover()
-    if url:
-        CACHE_FILE.parent.mkdir(exist_ok=True)
-        CACHE_FILE.write_text(url)
-    return url
+def _rediscover() -> bool:
+    global _rediscovered, _base_url
+    with _lock:
+        if _rediscovered:
+            return False
+        _rediscovered = True
+    print(f"    [Coles] URL 可能失效，重新发现...")
+    metrics.count("Coles", "rediscover")
+    with _discover_lock:
+        CACHE_FILE.unlink(missing_ok=True)
+        # 搜索页的缓存（新鲜期内 / 304）会把同一个旧 URL 再解析出来：一起作废
+        httpcache.forget(_SEARCH_PAGE)
+        _base_url = None
+    return True
+
 
+# ── storeId 是否可用：本次运行内存 + 跨运行持久化（带 TTL）──────────────────────
 
+def _store_id_ok() -> bool | None:
+    global _state
+    with _lock:
+        if _state is None:
+            try:
+                _state = json.loads(STATE_FILE.read_text(encoding="utf-8"))
+            except Exception:
+                _state = {}
+            if time.time() - _state.get("checked_at", 0) > STATE_TTL:
+                _state = {}
+        return _state.get("store_id_ok")
+
+
+def _remember_store_id(ok: bool):
+    global _state
+    with _lock:
+        if _state and _state.get("store_id_ok") is ok:
+            return
+        _state = {"store_id_ok": ok, "checked_at": int(time.time())}
+        STATE_FILE.parent.mkdir(exist_ok=True)
+        STATE_FILE.write_text(json.dumps(_state), encoding="utf-8")
+
+
+def _get_base_url() -> str | None:
+    global _base_url
+    with _discover_lock:
+        if _base_url:
+            return _base_url
+        if CACHE_FILE.exists():
+            cached = CACHE_FILE.read_text().strip()
+            if cached:
+                _base_url = cached
+                return cached
+        url = _discover()
+        if url:
+            CACHE_FILE.parent.mkdir(exist_ok=True)
+            CACHE_FILE.write_text(url)
+            _base_url = url
+        return url
+
+
+@metrics.timed("Coles", "discover")
 def _discover() -> str | None:
-    """从 Coles 搜索页的 __NEXT_DATA__ 或 JS 中提取 API BASE_URL"""
+    """从 Coles 搜索页的 __NEXT_DATA__ 或 JS 中提取 API BASE_URL，两种方法的先后由计分板决定"""
     try:
-        resp = _scraper.get(
-            "https://www.coles.com.au/search?q=milk",
+        resp = client.get(
+            "Coles",
+            _SEARCH_PAGE,
             headers={**BASE_HEADERS, "Accept": "text/html"},
-            timeout=25,
+            cache=True,
         )
-        html = resp.text
-
-        # 方法1: __NEXT_DATA__ runtimeConfig
-        m = re.search(r'<script id="__NEXT_DATA__"[^>]*>(.*?)</script>', html, re.DOTALL)
-        if m:
-            try:
-                data    = json.loads(m.group(1))
-                runtime = (data.get("runtimeConfig")
-                           or data.get("publicRuntimeConfig", {}))
-                for key in ("API_HOST", "API_BASE", "NEXT_PUBLIC_API_BASE", "apiBase"):
-                    val = runtime.get(key, "")
-                    if val and "coles.com.au" in val:
-                        print(f"    [Coles] 从 __NEXT_DATA__ 找到 API URL: {val}")
-                        return val.rstrip("/")
-            except Exception:
-                pass
-
-        # 方法2: JS 里正则找 API 子域
-        for pat in [
-            r'["\'](https://[a-z0-9\-]+\.coles\.com\.au)["\']',
-            r'baseURL\s*[:=]\s*["\'](https://[^"\']+)["\']',
-        ]:
-            for found in re.findall(pat, html):
-                if "www.coles.com.au" not in found:
-                    print(f"    [Coles] 从 JS 找到 API URL: {found}")
-                    return found.rstrip("/")
+        # 搜索页没变（304）时沿用上次从这一页解析出的 URL
+        if url := httpcache.derived(resp, "coles_api_url/v1", lambda: _discover_from(resp.text)):
+            return url
 
         # 方法3: 兜底用主站
         print("    [Coles] 使用主站 URL 作为兜底")
+        metrics.count("Coles", "discover_fallback")
         return "https://www.coles.com.au"
 
     except Exception as e:
         print(f"    [Coles] URL 发现失败: {e}")
         return None
+
+
+def _discover_from(html: str) -> str | None:
+    for method in strategy.order("Coles/discover", ["next_data", "js"]):
+        t0  = time.perf_counter()
+        url = _DISCOVERERS[method](html)
+        strategy.record("Coles/discover", method, bool(url), time.perf_counter() - t0)
+        if url:
+            metrics.count("Coles", f"discover_{method}")
+            return url
+    return None
+
+
+def _discover_next_data(html: str) -> str | None:
+    """方法1: __NEXT_DATA__ runtimeConfig"""
+    m = re.search(r'<script id="__NEXT_DATA__"[^>]*>(.*?)</script>', html, re.DOTALL)
+    if not m:
+        return None
+    try:
+        data    = json.loads(m.group(1))
+        runtime = (data.get("runtimeConfig")
+                   or data.get("publicRuntimeConfig", {}))
+        for key in ("API_HOST", "API_BASE", "NEXT_PUBLIC_API_BASE", "apiBase"):
+            val = runtime.get(key, "")
+            if val and "coles.com.au" in val:
+                print(f"    [Coles] 从 __NEXT_DATA__ 找到 API URL: {val}")
+                return val.rstrip("/")
+    except Exception:
+        pass
+    return None
+
+
+def _discover_js(html: str) -> str | None:
+    """方法2: JS 里正则找 API 子域"""
+    for pat in [
+        r'["\'](https://[a-z0-9\-]+\.coles\.com\.au)["\']',
+        r'baseURL\s*[:=]\s*["\'](https://[^"\']+)["\']',
+    ]:
+        for found in re.findall(pat, html):
+            if "www.coles.com.au" not in found:
+                print(f"    [Coles] 从 JS 找到 API URL: {found}")
+                return found.rstrip("/")
+    return None
+
+
+_DISCOVERERS = {"next_data": _discover_next_data, "js": _discover_js}
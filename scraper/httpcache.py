@@ -0,0 +1,169 @@
+"""
+磁盘 HTTP 缓存 + 条件请求（ALDI 分类页、Woolworths 商品页、Coles 发现页）
+
+client.get(..., cache=True) 时：
+- 有缓存且 Cache-Control max-age 还没过：直接用缓存，不发请求
+- 否则带 If-None-Match / If-Modified-Since 去问；304 就把缓存的正文当作 200 返回
+- 200 且带 ETag / Last-Modified / max-age（且不是 no-store）才写入缓存
+
+derived(resp, name, compute) 把由正文算出来的解析结果（必须能 JSON 序列化）存在同一
+条目上：304 复用正文时连解析也跳过。正文一变，旧的解析结果随条目一起作废。
+
+每个条目两个文件：<key>.body（原始字节）和 <key>.json（URL、响应头、时间、解析结果）。
+超过 MAX_AGE 没被用到的条目删除，总大小超过 MAX_BYTES 时按最近使用时间淘汰，
+进程退出时整理一次。data/httpcache/ 不进 git，CI 里用 actions/cache 传递。
+"""
+import atexit
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlencode
+
+from scraper import metrics
+
+CACHE_DIR = Path(os.environ.get("HTTP_CACHE_DIR", "data/httpcache"))
+MAX_BYTES = int(float(os.environ.get("HTTP_CACHE_MAX_MB", 50)) * 1024 * 1024)
+MAX_AGE   = 14 * 24 * 3600   # 秒；这么久没用到的条目删除
+_KEEP     = ("Content-Type", "ETag", "Last-Modified", "Cache-Control")
+_MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+_lock = threading.Lock()
+_pruning_registered = False
+
+
+def key(url: str, params: dict | None = None) -> str:
+    if params:
+        url += ("&" if "?" in url else "?") + urlencode(sorted(params.items()))
+    return hashlib.sha1(url.encode("utf-8")).hexdigest()[:24]
+
+
+def lookup(k: str) -> dict | None:
+    try:
+        entry = json.loads((CACHE_DIR / f"{k}.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    return entry if (CACHE_DIR / f"{k}.body").exists() else None
+
+
+def forget(url: str, params: dict | None = None):
+    """删掉这个 URL 的条目（连同解析结果）：下次 cache=True 的请求无条件重新取"""
+    k = key(url, params)
+    with _lock:
+        (CACHE_DIR / f"{k}.json").unlink(missing_ok=True)
+        (CACHE_DIR / f"{k}.body").unlink(missing_ok=True)
+
+
+def fresh(entry: dict) -> bool:
+    cc = entry["headers"].get("Cache-Control", "")
+    m  = _MAX_AGE_RE.search(cc)
+    return bool(m) and "no-cache" not in cc and time.time() - entry["stored_at"] < int(m.group(1))
+
+
+def validators(entry: dict) -> dict:
+    h = {}
+    if etag := entry["headers"].get("ETag"):
+        h["If-None-Match"] = etag
+    if modified := entry["headers"].get("Last-Modified"):
+        h["If-Modified-Since"] = modified
+    return h
+
+
+def response(k: str, entry: dict, url: str):
+    """用缓存条目拼一个 200 响应；resp.from_cache 为真"""
+    from requests import Response
+    from requests.structures import CaseInsensitiveDict
+
+    resp = Response()
+    resp.status_code = 200
+    resp._content    = (CACHE_DIR / f"{k}.body").read_bytes()
+    resp.headers     = CaseInsensitiveDict(entry["headers"])
+    resp.url         = url
+    resp.encoding    = entry.get("encoding") or "utf-8"
+    resp.from_cache  = True
+    resp.cache_key   = k
+    os.utime(CACHE_DIR / f"{k}.json")    # 最近使用时间，淘汰时用
+    return resp
+
+
+def settle(k: str, resp, entry: dict | None, url: str, store: str):
+    """请求结束后：304 → 缓存正文；可缓存的 200 → 写入；其它原样返回"""
+    if resp.status_code == 304 and entry:
+        metrics.count(store, "http_cache_304")
+        return response(k, entry, url)
+    if resp.status_code != 200:
+        return resp
+    cc = resp.headers.get("Cache-Control", "")
+    if "no-store" in cc or not (resp.headers.get("ETag") or resp.headers.get("Last-Modified")
+                                or _MAX_AGE_RE.search(cc)):
+        return resp
+    _store(k, url, resp)
+    resp.from_cache = False
+    resp.cache_key  = k
+    return resp
+
+
+def derived(resp, name: str, compute):
+    """从正文算出的结果：304 复用时直接取上次存的，否则计算并存到条目上"""
+    k = getattr(resp, "cache_key", None)
+    if k is None:
+        return compute()
+    if getattr(resp, "from_cache", False):
+        entry = lookup(k)
+        if entry and name in entry.get("derived", {}):
+            metrics.count("http_cache", f"derived_{name}")
+            return entry["derived"][name]
+    value = compute()
+    with _lock:
+        if entry := lookup(k):
+            entry.setdefault("derived", {})[name] = value
+            _write(CACHE_DIR / f"{k}.json", json.dumps(entry, ensure_ascii=False).encode("utf-8"))
+    return value
+
+
+def _store(k: str, url: str, resp):
+    global _pruning_registered
+    entry = {"url": url, "stored_at": time.time(), "encoding": resp.encoding,
+             "headers": {h: resp.headers[h] for h in _KEEP if h in resp.headers}}
+    with _lock:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        _write(CACHE_DIR / f"{k}.body", resp.content)
+        _write(CACHE_DIR / f"{k}.json", json.dumps(entry, ensure_ascii=False).encode("utf-8"))
+        if not _pruning_registered:
+            atexit.register(prune)
+            _pruning_registered = True
+
+
+def _write(path: Path, data: bytes):
+    # 分片是多个进程共用 CACHE_DIR：临时文件名带上进程号，线程号在不同进程间会重复
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_bytes(data)
+    tmp.replace(path)
+
+
+def prune(now: float | None = None) -> int:
+    """删掉过期条目，再按最近使用时间淘汰到 MAX_BYTES 以内；返回删除的条目数"""
+    if not CACHE_DIR.exists():
+        return 0
+    now, entries = now or time.time(), []
+    with _lock:
+        for meta in CACHE_DIR.glob("*.json"):
+            body = meta.with_suffix(".body")
+            try:
+                used, size = meta.stat().st_mtime, meta.stat().st_size + body.stat().st_size
+            except OSError:
+                used, size = 0, 0
+            entries.append((used, size, meta, body))
+        entries.sort()
+        total, removed = sum(e[1] for e in entries), 0
+        for used, size, meta, body in entries:
+            if now - used <= MAX_AGE and total <= MAX_BYTES:
+                break
+            meta.unlink(missing_ok=True)
+            body.unlink(missing_ok=True)
+            total   -= size
+            removed += 1
+    return removed
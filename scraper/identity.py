@@ -0,0 +1,97 @@
+"""
+商品身份索引：watchlist 里的查询词 → 各超市的商品 ID
+
+Coles 按 coles_query 搜索、ALDI 按关键词在分类页里找，原来每次运行都重新搜索、
+重新匹配，候选顺序一变就可能挑中别的商品。第一次按词元打分（score）在候选里选出
+最佳匹配后，把商品 ID 记在 data/identity.json；之后直接按 ID 取价，只有按 ID
+取不到（下架、换 ID）时才 forget() 并重新搜索。
+
+打分：查询词元的覆盖率为主，候选多出来的词元轻微扣分；低于 MIN_SCORE 不算匹配。
+"""
+import atexit
+import json
+import re
+import threading
+import time
+from pathlib import Path
+
+IDENTITY_FILE = Path("data/identity.json")
+MIN_SCORE     = 0.6
+RECALL_WT     = 0.8    # 其余权重给 precision（候选名里有多少词元被查询覆盖）
+
+_lock = threading.Lock()
+_index: dict | None = None
+_dirty = False
+
+
+def tokens(text: str) -> set[str]:
+    return set(re.findall(r"[a-z0-9]+", text.lower()))
+
+
+def key(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+def score(query: str, candidate: str) -> float:
+    want, have = tokens(query), tokens(candidate)
+    if not want or not have:
+        return 0.0
+    common = len(want & have)
+    return RECALL_WT * common / len(want) + (1 - RECALL_WT) * common / len(have)
+
+
+def best(query: str, candidates, text=lambda c: c) -> tuple[object, float]:
+    """(最佳候选, 分数)；分数相同保留靠前的（原来的排序）；没有达到 MIN_SCORE 返回 (None, 分数)"""
+    top, top_score = None, 0.0
+    for c in candidates:
+        s = score(query, text(c))
+        if s > top_score:
+            top, top_score = c, s
+    return (top, top_score) if top_score >= MIN_SCORE else (None, top_score)
+
+
+def _load() -> dict:
+    global _index
+    if _index is None:
+        try:
+            _index = json.loads(IDENTITY_FILE.read_text(encoding="utf-8"))
+        except Exception:
+            _index = {}
+        atexit.register(save)
+    return _index
+
+
+def get(store: str, query: str) -> str | None:
+    with _lock:
+        entry = _load().get(store, {}).get(key(query))
+    return entry and entry["id"]
+
+
+def remember(store: str, query: str, product_id: str, name: str, match: float):
+    global _dirty
+    with _lock:
+        entries = _load().setdefault(store, {})
+        if entries.get(key(query), {}).get("id") == product_id:
+            return
+        entries[key(query)] = {"id": product_id, "name": name, "score": round(match, 3),
+                               "resolved_at": int(time.time())}
+        _dirty = True
+    print(f"    [identity] {store} '{query}' → {name} ({product_id})")
+
+
+def forget(store: str, query: str):
+    global _dirty
+    with _lock:
+        if _load().get(store, {}).pop(key(query), None) is not None:
+            _dirty = True
+
+
+def save():
+    global _dirty
+    with _lock:
+        if not _dirty:
+            return
+        IDENTITY_FILE.parent.mkdir(exist_ok=True)
+        IDENTITY_FILE.write_text(json.dumps(_index, ensure_ascii=False, indent=1, sort_keys=True),
+                                 encoding="utf-8")
+        _dirty = False
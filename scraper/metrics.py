@@ -0,0 +1,178 @@
+"""
+运行指标：每家超市、每个抓取策略的耗时 / 调用次数 / 命中次数，外加计数器和下载字节直方图。
+
+设置 METRICS_DIR 才启用；monitor.main 结束时调用 write()，在该目录写出
+run_report.json 和 Prometheus textfile（carnegie.prom，供 node_exporter 收集）。
+未启用时 timed() 包装的函数每次只多一次全局变量判断，count() / observe() 直接返回。
+
+    @metrics.timed("Woolworths", "api")      # 返回值为真记一次命中
+    def _try_api(...): ...
+
+    metrics.count("Coles", "dedupe_hit")
+    metrics.observe_bytes("ALDI", len(body))
+"""
+import functools
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+METRICS_DIR = os.environ.get("METRICS_DIR")
+_enabled    = bool(METRICS_DIR)
+
+SECONDS_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20)
+BYTES_BUCKETS   = (1_000, 10_000, 50_000, 100_000, 250_000, 500_000, 1_000_000, 5_000_000)
+
+_lock       = threading.Lock()
+_started    = time.time()
+_strategies: dict = {}   # (retailer, strategy) → {"calls", "wins", "errors", "seconds": hist}
+_counters:   dict = {}   # (retailer, name) → int
+_bytes:      dict = {}   # retailer → hist
+_extra:      dict = {}   # 其它模块附加到报告里的段落（如熔断器状态）
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def enable(directory: str | None = None):
+    global _enabled, METRICS_DIR
+    METRICS_DIR = directory or METRICS_DIR or "data/metrics"
+    _enabled = True
+
+
+def _hist(buckets) -> dict:
+    return {"buckets": list(buckets), "counts": [0] * (len(buckets) + 1), "sum": 0.0, "count": 0}
+
+
+def _add(h: dict, value: float):
+    for n, le in enumerate(h["buckets"]):
+        if value <= le:
+            h["counts"][n] += 1
+            break
+    else:
+        h["counts"][-1] += 1
+    h["sum"]   += value
+    h["count"] += 1
+
+
+def record(retailer: str, strategy: str, seconds: float, won: bool, error: bool = False):
+    if not _enabled:
+        return
+    with _lock:
+        s = _strategies.get((retailer, strategy))
+        if s is None:
+            s = _strategies[(retailer, strategy)] = {"calls": 0, "wins": 0, "errors": 0,
+                                                     "seconds": _hist(SECONDS_BUCKETS)}
+        s["calls"]  += 1
+        s["wins"]   += bool(won)
+        s["errors"] += bool(error)
+        _add(s["seconds"], seconds)
+
+
+def timed(retailer: str, strategy: str):
+    """装饰器：记录耗时，返回值为真算命中，抛异常算错误"""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            t0 = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception:
+                record(retailer, strategy, time.perf_counter() - t0, False, error=True)
+                raise
+            record(retailer, strategy, time.perf_counter() - t0, bool(result))
+            return result
+        return inner
+    return wrap
+
+
+def count(retailer: str, name: str, n: int = 1):
+    if not _enabled:
+        return
+    with _lock:
+        _counters[(retailer, name)] = _counters.get((retailer, name), 0) + n
+
+
+def observe_bytes(retailer: str, n: int):
+    if not _enabled:
+        return
+    with _lock:
+        _add(_bytes.setdefault(retailer, _hist(BYTES_BUCKETS)), n)
+
+
+def annotate(section: str, value):
+    """往报告里加一段任意 JSON（如熔断器状态）"""
+    if _enabled:
+        with _lock:
+            _extra[section] = value
+
+
+def report() -> dict:
+    with _lock:
+        retailers: dict = {}
+        for (r, s), v in sorted(_strategies.items()):
+            retailers.setdefault(r, {}).setdefault("strategies", {})[s] = v
+        for (r, name), v in sorted(_counters.items()):
+            retailers.setdefault(r, {}).setdefault("counters", {})[name] = v
+        for r, h in sorted(_bytes.items()):
+            retailers.setdefault(r, {})["bytes"] = h
+        return {
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(_started)),
+            "duration_s": round(time.time() - _started, 3),
+            "retailers":  json.loads(json.dumps(retailers)),
+            **json.loads(json.dumps(_extra)),
+        }
+
+
+def prometheus(rep: dict | None = None) -> str:
+    rep   = rep or report()
+    lines = [
+        "# HELP carnegie_run_duration_seconds Wall time of the monitor run.",
+        "# TYPE carnegie_run_duration_seconds gauge",
+        f"carnegie_run_duration_seconds {rep['duration_s']}",
+    ]
+
+    def hist(name, labels, h):
+        acc = 0
+        for le, c in zip([*h["buckets"], "+Inf"], h["counts"]):
+            acc += c
+            lines.append(f'{name}_bucket{{{labels},le="{le}"}} {acc}')
+        lines.append(f"{name}_sum{{{labels}}} {h['sum']}")
+        lines.append(f"{name}_count{{{labels}}} {h['count']}")
+
+    lines += ["# TYPE carnegie_strategy_calls_total counter",
+              "# TYPE carnegie_strategy_wins_total counter",
+              "# TYPE carnegie_strategy_errors_total counter",
+              "# TYPE carnegie_strategy_seconds histogram",
+              "# TYPE carnegie_events_total counter",
+              "# TYPE carnegie_http_response_bytes histogram"]
+    for r, data in rep["retailers"].items():
+        for s, v in data.get("strategies", {}).items():
+            labels = f'retailer="{r}",strategy="{s}"'
+            lines.append(f"carnegie_strategy_calls_total{{{labels}}} {v['calls']}")
+            lines.append(f"carnegie_strategy_wins_total{{{labels}}} {v['wins']}")
+            lines.append(f"carnegie_strategy_errors_total{{{labels}}} {v['errors']}")
+            hist("carnegie_strategy_seconds", labels, v["seconds"])
+        for name, v in data.get("counters", {}).items():
+            lines.append(f'carnegie_events_total{{retailer="{r}",event="{name}"}} {v}')
+        if "bytes" in data:
+            hist("carnegie_http_response_bytes", f'retailer="{r}"', data["bytes"])
+    return "\n".join(lines) + "\n"
+
+
+def write(directory: str | None = None) -> Path | None:
+    if not _enabled:
+        return None
+    out = Path(directory or METRICS_DIR)
+    out.mkdir(parents=True, exist_ok=True)
+    rep = report()
+    (out / "run_report.json").write_text(json.dumps(rep, indent=2, ensure_ascii=False), encoding="utf-8")
+    # textfile collector 要求原子替换
+    tmp = out / "carnegie.prom.tmp"
+    tmp.write_text(prometheus(rep), encoding="utf-8")
+    tmp.replace(out / "carnegie.prom")
+    return out
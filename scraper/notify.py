@@ -1,26 +1,178 @@
+"""
+Telegram 通知管道
+
+send() 只负责入队：消息按行切成不超过 MAX_LEN（Telegram 上限 4096）的段，
+每段先写进 data/outbox/ 再由后台线程按顺序发出，发成功才删除；monitor 结束前
+flush() 等队列发完。发送失败（网络、5xx、熔断）的段留在 outbox，下次运行最先补发。
+
+段文件先写临时文件再 replace，进程被杀也不会留下半个 JSON；读不出来的段改名为
+.bad 隔离，不会堵住后面的消息，发送线程本身也不会因为任何异常退出。
+
+429 按响应里的 parameters.retry_after 等待后重发；Markdown 解析失败（400）
+退回纯文本重发一次。HTTP 走 client 的共享 session（连接复用）。
+TELEGRAM_API_BASE 可以指向本地的假 Bot API（见 bench/notify.py）。
+"""
+import json
 import os
-import requests
+import queue
+import threading
+import time
+from pathlib import Path
+
+from scraper import client
+
+API_BASE        = os.environ.get("TELEGRAM_API_BASE", "https://api.telegram.org").rstrip("/")
+OUTBOX_DIR      = Path("data/outbox")
+MAX_LEN         = 4096
+SEND_ATTEMPTS   = 4
+MAX_RETRY_AFTER = 60     # 秒；retry_after 更长就留到下次运行
+
+_queue: "queue.Queue[Path]" = queue.Queue()
+_queued: set[Path] = set()
+_lock   = threading.Lock()
+_worker: threading.Thread | None = None
+_seq    = 0
+_failed = threading.Event()   # 出现过发不出去的段：到下一次 flush 之前后面的段都不再尝试，保持顺序
+
+
+def send(text: str, chat_id: str | None = None) -> bool:
+    """入队（先落盘）；返回是否已入队。chat_id 默认 TELEGRAM_CHAT_ID（bot 回复时指定）"""
+    global _seq
+    chat_id = chat_id or os.environ["TELEGRAM_CHAT_ID"]
+    _start()
+    OUTBOX_DIR.mkdir(parents=True, exist_ok=True)
+    with _lock:
+        _enqueue_backlog()
+        for part in split(text):
+            _seq += 1
+            path = OUTBOX_DIR / f"{time.time_ns()}-{_seq:04d}.json"
+            tmp  = path.with_suffix(".tmp")
+            tmp.write_text(json.dumps({"chat_id": chat_id, "text": part}, ensure_ascii=False),
+                           encoding="utf-8")
+            tmp.replace(path)
+            _queued.add(path)
+            _queue.put(path)
+    return True
+
+
+def flush(timeout: float | None = None) -> int:
+    """
+    等队列发完（或超时）；返回仍留在 outbox 里的段数。
+    这次运行没有 send() 过也会先把 outbox 里留下的段排进队列补发
+    """
+    if OUTBOX_DIR.exists() and any(OUTBOX_DIR.glob("*.json")):
+        _start()
+        with _lock:
+            _enqueue_backlog()
+    if _worker is not None:
+        done = threading.Event()
+        _queue.put(done)
+        done.wait(timeout)
+    _failed.clear()   # 常驻模式：下一轮 send() / flush() 会把留下的段重新排进队列
+    return len(list(OUTBOX_DIR.glob("*.json"))) if OUTBOX_DIR.exists() else 0
+
+
+def split(text: str, limit: int = MAX_LEN) -> list[str]:
+    """按行切段；单行超长时才在行内硬切"""
+    parts, buf, size = [], [], 0
+    for line in text.split("\n"):
+        while len(line) > limit:
+            if buf:
+                parts.append("\n".join(buf)); buf, size = [], 0
+            parts.append(line[:limit]); line = line[limit:]
+        if buf and size + 1 + len(line) > limit:
+            parts.append("\n".join(buf)); buf, size = [], 0
+        size += len(line) + (1 if buf else 0)
+        buf.append(line)
+    if buf:
+        parts.append("\n".join(buf))
+    return parts
+
 
+def _start():
+    """启动后台发送线程；上次运行留在 outbox 里的段排在最前面"""
+    global _worker
+    with _lock:
+        if _worker is not None:
+            return
+        if n := _enqueue_backlog():
+            print(f"  [Telegram] outbox 里有 {n} 条上次没发出的消息，先补发")
+        _worker = threading.Thread(target=_run, name="telegram", daemon=True)
+        _worker.start()
 
-def send(text: str) -> bool:
-    token   = os.environ["TELEGRAM_BOT_TOKEN"]
-    chat_id = os.environ["TELEGRAM_CHAT_ID"]
+
+def _enqueue_backlog() -> int:
+    """outbox 里还没排进队列的段按文件名（时间）顺序入队；调用方持有 _lock"""
+    if not OUTBOX_DIR.exists():
+        return 0
+    backlog = [p for p in sorted(OUTBOX_DIR.glob("*.json")) if p not in _queued]
+    for path in backlog:
+        _queued.add(path)
+        _queue.put(path)
+    return len(backlog)
+
+
+def _run():
+    while True:
+        item = _queue.get()
+        if isinstance(item, threading.Event):
+            item.set()
+            continue
+        try:
+            if not _failed.is_set() and item.exists() and not _deliver(item):
+                _failed.set()
+        except Exception as e:
+            print(f"  [Telegram] 发送线程异常: {e}")
+            _failed.set()
+        finally:
+            with _lock:
+                _queued.discard(item)
+
+
+def _deliver(path: Path) -> bool:
     try:
-        r = requests.post(
-            f"https://api.telegram.org/bot{token}/sendMessage",
-            json={
-                "chat_id":                  chat_id,
-                "text":                     text,
-                "parse_mode":               "Markdown",
-                "disable_web_page_preview": True,
-            },
-            timeout=10,
-        )
-        r.raise_for_status()
+        msg  = json.loads(path.read_text(encoding="utf-8"))
+        body = {"chat_id": msg["chat_id"], "text": msg["text"],
+                "parse_mode": "Markdown", "disable_web_page_preview": True}
+    except (ValueError, KeyError, TypeError):
+        # 写了一半或被改坏的段：隔离出来，接着发后面的
+        print(f"  [Telegram] outbox 里的 {path.name} 无法解析，已改名为 .bad")
+        path.replace(path.with_suffix(".bad"))
         return True
-    except Exception as e:
-        print(f"  [Telegram] 发送失败: {e}")
-        return False
+    token = os.environ["TELEGRAM_BOT_TOKEN"]
+    for _ in range(SEND_ATTEMPTS):
+        try:
+            r = client.post("Telegram", f"{API_BASE}/bot{token}/sendMessage", json=body)
+        except Exception as e:
+            print(f"  [Telegram] 发送失败: {e}")
+            return False
+        if r.status_code == 200:
+            path.unlink(missing_ok=True)
+            return True
+        desc, wait = _error(r)
+        if r.status_code == 429 and wait <= MAX_RETRY_AFTER:
+            print(f"  [Telegram] 被限流，{wait} 秒后重发")
+            time.sleep(wait)
+        elif r.status_code == 400 and "parse_mode" in body:
+            # 切段或商品名里的字符把 Markdown 弄坏了：改成纯文本再发
+            body.pop("parse_mode")
+        elif 400 <= r.status_code < 500 and r.status_code != 429:
+            # 重发也不会成功（chat 不存在、bot 被踢出等）：丢掉，别堵住后面的消息
+            print(f"  [Telegram] 消息被拒绝（{r.status_code} {desc}），已丢弃")
+            path.unlink(missing_ok=True)
+            return True
+        else:
+            print(f"  [Telegram] 发送失败: HTTP {r.status_code} {desc}")
+            return False
+    return False
+
+
+def _error(r) -> tuple[str, int]:
+    try:
+        data = r.json()
+    except ValueError:
+        return r.text[:200], 0
+    return data.get("description", ""), int((data.get("parameters") or {}).get("retry_after") or 0)
 
 
 def price_change_message(alerts: list) -> str:
@@ -37,6 +189,7 @@ def price_change_message(alerts: list) -> str:
                 f"• *{a['item']}* — {a['store']} {a['branch']}\n"
                 f"  ~~${a['old_price']:.2f}~~ → *${a['new_price']:.2f}*"
                 f"  (-${abs(a['change']):.2f} / -{pct:.0f}%{tag})"
+                + _history_note(a)
             )
         lines.append("")
 
@@ -52,7 +205,20 @@ def price_change_message(alerts: list) -> str:
     return "\n".join(lines)
 
 
-def daily_summary_message(prices: dict) -> str:
+def _history_note(a: dict) -> str:
+    """detect.enrich 附加的历史信息：新低标记 + 近 N 周中位价"""
+    notes = []
+    if a.get("all_time_low"):
+        notes.append("🏆 历史最低")
+    elif a.get("window_low"):
+        notes.append(f"🔻 {a['window_weeks']} 周最低")
+    if a.get("baseline") is not None:
+        notes.append(f"近 {a['window_weeks']} 周中位 ${a['baseline']:.2f}")
+    return f"\n  {' · '.join(notes)}" if notes else ""
+
+
+def daily_summary_message(prices: dict, basket: dict | None = None, units: dict | None = None) -> str:
+    """basket 是 basket.plans() 的结果，units 是 basket.unit_best() 的结果（都可以不给）"""
     lines = [
         "📊 *Carnegie 3163 每日价格*",
         "📍 Woolworths #3298 | Coles Carnegie | ALDI\n",
@@ -70,4 +236,29 @@ def daily_summary_message(prices: dict) -> str:
         ]
         lines.append(f"*{item_name}*  最优 *${best_price:.2f}* ({best_store})")
         lines.append(f"  {' | '.join(parts)}")
+        if units and item_name in units and units[item_name][0] != best_store:
+            store, per, unit = units[item_name]
+            lines.append(f"  ⚖️ 按单价 {store} ${per:.2f}/{unit} 更划算")
+    if basket:
+        lines += _basket_lines(basket)
     return "\n".join(lines)
+
+
+def _basket_lines(basket: dict) -> list:
+    """basket.plans() 的结果：1 / 2 / 3 家店各自最省的组合"""
+    items = next(iter(basket.values()))["items"]
+    lines = ["", f"🧺 *整篮最省方案*（共 {items} 件）"]
+    prev  = None
+    for k, p in sorted(basket.items()):
+        if prev and p["covered"] <= prev["covered"] and p["cost"] >= prev["cost"]:
+            continue    # 多跑一家店既不多买到东西也不省钱，不列
+        prev  = p
+        split = " / ".join(f"{s} {n}" for s, n in p["split"].items() if n) if k > 1 else ""
+        notes = [split] if split else []
+        if p["covered"] < p["items"]:
+            notes.append(f"缺 {p['items'] - p['covered']} 件")
+        if p["cost"] != p["total"]:
+            notes.append(f"含路程 ${p['cost'] - p['total']:.2f}")
+        note = f"（{'，'.join(notes)}）" if notes else ""
+        lines.append(f"{k} 家：*{' + '.join(p['stores'])}* ${p['total']:.2f}{note}")
+    return lines
@@ -0,0 +1,48 @@
+"""
+按门店的令牌桶限速 + 随机抖动，取代 fetch_prices 里的全局 sleep。
+
+每个爬虫在发出 HTTP 请求前调用 acquire(门店)。
+未 configure 过的门店直接放行，所以单独调用 get_price 不受影响。
+"""
+import random
+import threading
+import time
+
+
+class TokenBucket:
+    """rate 个令牌/秒，最多攒 burst 个；取不到令牌时排队等待"""
+
+    def __init__(self, rate: float, burst: int = 1, jitter=(0.0, 0.0)):
+        self.rate    = rate
+        self.burst   = burst
+        self.jitter  = jitter
+        self._tokens = float(burst)
+        self._last   = time.monotonic()
+        self._lock   = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last   = now
+            # 预扣一个令牌（可为负），后来者自然排在后面
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        time.sleep(wait + random.uniform(*self.jitter))
+
+
+_buckets: dict[str, TokenBucket] = {}
+
+
+def configure(store: str, rate: float, burst: int = 1, jitter=(0.0, 0.0)):
+    _buckets[store] = TokenBucket(rate, burst, tuple(jitter))
+
+
+def acquire(store: str):
+    bucket = _buckets.get(store)
+    if bucket:
+        bucket.acquire()
+
+
+def reset():
+    _buckets.clear()
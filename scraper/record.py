@@ -0,0 +1,153 @@
+"""
+统一的价格记录：三家爬虫都产出 PriceRecord
+
+原来每家爬虫的 _build 各拼一个 dict，字段名还不一致（Woolworths 的 unit_price 是
+CupString 原文，Coles 的 unit 是 ofMeasurePrice，ALDI 没有）。PriceRecord 用 __slots__，
+每条记录不再带一个 dict；它同时是只读 Mapping，r["price"] / r.get("on_special") 照旧能用，
+detect / notify / history 不用改。
+
+单价在构造记录时规范化：CupString（"$1.50 / 1L"、"$0.85 / 100G"）和 Coles 的
+ofMeasurePrice / ofMeasureQuantity / ofMeasureUnits 统一换算成 unit_price（$）每 unit
+（kg / l / ea / m，其它单位原样），原文留在 unit_text。跨门店比单价直接比数字
+（basket.unit_best 一次算完整个快照）。
+
+存储（prices.json、检查点、分片的部分快照）：每条记录按 FIELDS 顺序编码成列表，
+文件头记下字段顺序；prices.json 每件商品一行。decode 也认旧格式的 dict。
+"""
+import json
+import re
+from collections.abc import Mapping
+from operator import attrgetter
+
+FIELDS = ("store", "branch", "name", "price", "was_price", "on_special", "source",
+          "unit_price", "unit", "unit_text")
+_FIELD_SET = frozenset(FIELDS)
+
+# 单位 → (规范单位, 换算系数)：100G → 0.1 kg
+_UNITS = {
+    "g": ("kg", 0.001), "gm": ("kg", 0.001), "gram": ("kg", 0.001), "grams": ("kg", 0.001),
+    "kg": ("kg", 1.0), "kilo": ("kg", 1.0),
+    "ml": ("l", 0.001), "l": ("l", 1.0), "lt": ("l", 1.0), "litre": ("l", 1.0), "liter": ("l", 1.0),
+    "ea": ("ea", 1.0), "each": ("ea", 1.0), "pk": ("ea", 1.0), "pack": ("ea", 1.0),
+    "cm": ("m", 0.01), "m": ("m", 1.0), "metre": ("m", 1.0),
+}
+_CUP_RE = re.compile(r"\$\s*(\d[\d,]*(?:\.\d+)?|\.\d+)\s*(?:/|per)\s*(\d*\.?\d*)\s*([a-z]+)", re.I)
+_values = attrgetter(*FIELDS)
+_dump   = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+
+class PriceRecord(Mapping):
+    __slots__ = FIELDS
+
+    def __init__(self, store, branch, name, price, was_price=None, on_special=False,
+                 source="", unit_price=None, unit="", unit_text=""):
+        self.store, self.branch, self.name = store, branch, name
+        self.price, self.was_price, self.on_special = price, was_price, bool(on_special)
+        self.source = source
+        self.unit_price, self.unit, self.unit_text = unit_price, unit, unit_text
+
+    def __getitem__(self, key):
+        if key not in _FIELD_SET:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        # Mapping.get 走 __getitem__ + 异常，热路径上（detect / basket / notify）直接取
+        return getattr(self, key) if key in _FIELD_SET else default
+
+    def __iter__(self):
+        return iter(FIELDS)
+
+    def __len__(self):
+        return len(FIELDS)
+
+    def __repr__(self):
+        unit = f", ${self.unit_price}/{self.unit}" if self.unit_price is not None else ""
+        return f"PriceRecord({self.store}, {self.name!r}, ${self.price}{unit}, {self.source})"
+
+
+def normalise(price, quantity, unit) -> tuple[float | None, str]:
+    """price 是每 quantity 个 unit 的价格 → ($/规范单位, 规范单位)"""
+    try:
+        price, quantity = float(price), float(quantity or 1)
+    except (TypeError, ValueError):
+        return None, ""
+    unit = (unit or "").strip().lower()
+    if not unit or quantity <= 0:
+        return None, ""
+    base, factor = _UNITS.get(unit, (unit, 1.0))
+    return round(price / (quantity * factor), 4), base
+
+
+def parse_unit(text: str) -> tuple[float | None, str]:
+    """CupString / "$1.50 per 1kg" 这类单价文本 → ($/规范单位, 规范单位)；解析不了返回 (None, "")"""
+    m = _CUP_RE.search(text or "")
+    if not m:
+        return None, ""
+    return normalise(m.group(1).replace(",", ""), m.group(2), m.group(3))
+
+
+def find_unit(text: str) -> str:
+    """长文本（ALDI 的商品块）里的单价片段；没有返回空串"""
+    m = _CUP_RE.search(text or "")
+    return m.group(0) if m else ""
+
+
+def build(store, branch, name, price, was_price=None, on_special=False, source="",
+          unit_text="", measure=None) -> PriceRecord:
+    """
+    爬虫用的构造函数。measure=(价格, 数量, 单位) 是结构化的单价（Coles 的 ofMeasure*），
+    优先于从 unit_text 里解析
+    """
+    unit_price, unit = normalise(*measure) if measure else (None, "")
+    if unit_price is None:
+        unit_price, unit = parse_unit(unit_text)
+    return PriceRecord(store, branch, name, price, was_price, on_special, source,
+                       unit_price, unit, unit_text or "")
+
+
+def encode(r) -> list:
+    return list(_values(r)) if isinstance(r, PriceRecord) else [r.get(f) for f in FIELDS]
+
+
+def decode(value, fields=FIELDS) -> PriceRecord:
+    """编码后的列表（fields 是文件头里的字段顺序）；旧格式的 dict 也认"""
+    if isinstance(value, list):
+        if fields is FIELDS:
+            return PriceRecord(*value)
+        return PriceRecord(**{f: v for f, v in zip(fields, value) if f in _FIELD_SET})
+    if "unit_text" in value:
+        return PriceRecord(**{f: value[f] for f in FIELDS if f in value})
+    # 旧格式：Woolworths 的 unit_price 是 CupString 原文；Coles 的 unit 只有 ofMeasurePrice，
+    # 没有数量和单位，换算不了，丢掉
+    text = value.get("unit_price")
+    return build(value.get("store"), value.get("branch", ""), value.get("name"), value.get("price"),
+                 value.get("was_price"), value.get("on_special", False), value.get("source", ""),
+                 text if isinstance(text, str) else "")
+
+
+def pack(snapshot: dict) -> dict:
+    """{商品: {门店: 记录}} → 可以 JSON 序列化的紧凑结构"""
+    return {"fields": FIELDS,
+            "items": {item: {s: encode(r) for s, r in stores.items() if r}
+                      for item, stores in snapshot.items()}}
+
+
+def unpack(data: dict) -> dict:
+    if not ("fields" in data and isinstance(data.get("items"), dict)):   # 旧格式
+        return {item: {s: decode(r) for s, r in stores.items() if r} for item, stores in data.items()}
+    fields = tuple(data["fields"])
+    fields = FIELDS if fields == FIELDS else fields     # 字段顺序没变：按位置构造，最快
+    return {item: {s: decode(r, fields) for s, r in stores.items()}
+            for item, stores in data["items"].items()}
+
+
+def dumps(snapshot: dict) -> str:
+    """prices.json：紧凑 JSON，每件商品一行（git diff 仍然按商品看得清）"""
+    data  = pack(snapshot)
+    items = ",\n".join(f" {_dump(item)}:{_dump(stores)}" for item, stores in data["items"].items())
+    return f'{{"fields":{_dump(data["fields"])},\n"items":{{\n{items}\n}}}}\n'
+
+
+def loads(text: str) -> dict:
+    return unpack(json.loads(text))
@@ -0,0 +1,45 @@
+"""
+门店注册表：门店 → 爬虫模块，按需导入
+
+monitor 启动时不导入任何爬虫模块；某家门店的取价函数第一次被调用时才导入对应模块
+（连同它带进来的 bs4 等依赖）。watchlist 只涉及 Woolworths、或者这次只是 --dry-run，
+就不为 Coles / ALDI 付导入成本。cloudscraper 本来就由 client 在建 session 时才导入。
+"""
+import importlib
+import sys
+
+# 门店 → (模块, 取价函数, 批量取价函数或 None, 日志标签, 从 watchlist 条目里取参数)
+STORES = {
+    "Woolworths": ("scraper.woolworths", "get_price", "get_prices", "WW:   ",
+                   lambda i: i.get("woolworths_id")),
+    "Coles":      ("scraper.coles", "get_price", None, "Coles:",
+                   lambda i: i.get("coles_query")),
+    "ALDI":       ("scraper.aldi", "get_price", None, "ALDI: ",
+                   lambda i: i.get("monitor_aldi") and i.get("aldi_keyword")),
+}
+
+
+def _lazy(module: str, name: str):
+    def call(*args, **kwargs):
+        return getattr(importlib.import_module(module), name)(*args, **kwargs)
+    call.__module__, call.__name__ = module, name
+    return call
+
+
+def table() -> tuple:
+    """monitor 用的 (门店, 标签, 取价, 批量取价, 取参数) 元组，顺序即门店的固定顺序"""
+    return tuple((store, label, _lazy(mod, get), batch and _lazy(mod, batch), key)
+                 for store, (mod, get, batch, label, key) in STORES.items())
+
+
+def needed(watchlist: list) -> list[str]:
+    """watchlist 实际涉及的门店"""
+    return [store for store, (*_, key) in STORES.items() if any(key(i) for i in watchlist)]
+
+
+def loaded(store: str) -> bool:
+    return STORES[store][0] in sys.modules
+
+
+def module(store: str):
+    return importlib.import_module(STORES[store][0])
@@ -0,0 +1,172 @@
+"""
+HTTP 录制 / 回放：不碰真实超市网站也能测量爬虫改动。
+
+录制：设置 HTTP_RECORD_DIR=目录，client 发出的每个请求连同响应存成一个 JSON 文件
+      （文件名是 方法+原始 URL 的哈希，Telegram bot token 会被抹掉）。
+回放：起一个本地替身服务器，再设置 HTTP_REPLAY=http://127.0.0.1:端口，
+      client 会把 https://host/path 改写成 http://127.0.0.1:端口/host/path。
+
+    python -m scraper.replay fixtures/ --port 8765 --latency 0.05 0.2 --error-rate 0.02
+
+服务器按录制的 fixture 应答；找不到时交给 fallback（基准脚本用它合成响应），再没有就 404。
+带 ETag 的响应遇到匹配的 If-None-Match 时回 304。
+可注入延迟和错误（503 或 Cloudflare 挑战页），并统计请求数和字节数。
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+RECORD_DIR = os.environ.get("HTTP_RECORD_DIR")
+REPLAY_URL = os.environ.get("HTTP_REPLAY", "").rstrip("/")
+
+_KEEP_HEADERS = ("Content-Type", "ETag", "Last-Modified", "Cache-Control", "Retry-After")
+_TOKEN_RE     = re.compile(r"/bot[^/]+/")
+_CHALLENGE    = "<html><head><title>Just a moment...</title></head><body>cf-chl</body></html>"
+
+
+def fixture_key(method: str, url: str) -> str:
+    url = _TOKEN_RE.sub("/botTOKEN/", url)
+    return hashlib.sha1(f"{method.upper()} {url}".encode()).hexdigest()[:20]
+
+
+# ── client 侧 ────────────────────────────────────────────────────────────────
+
+def rewrite(url: str) -> str:
+    if not REPLAY_URL:
+        return url
+    parts = urlsplit(url)
+    return f"{REPLAY_URL}/{parts.netloc}{parts.path}" + (f"?{parts.query}" if parts.query else "")
+
+
+def record(method: str, resp):
+    if not RECORD_DIR or REPLAY_URL:
+        return
+    first = resp.history[0] if resp.history else resp
+    url   = first.request.url
+    path  = Path(RECORD_DIR) / f"{fixture_key(method, url)}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({
+        "method":  method.upper(),
+        "url":     _TOKEN_RE.sub("/botTOKEN/", url),
+        "status":  resp.status_code,
+        "headers": {k: resp.headers[k] for k in _KEEP_HEADERS if k in resp.headers},
+        "body":    resp.text,
+    }, ensure_ascii=False), encoding="utf-8")
+
+
+# ── 本地替身服务器 ────────────────────────────────────────────────────────────
+
+class ReplayServer:
+    """
+    fixture_dir: 录制的 fixture 目录（可为 None）
+    fallback:    (method, url, body) -> (status, headers, body) | None，找不到 fixture 时调用
+    latency:     每个请求随机延迟区间（秒）
+    error_rate:  按概率返回错误；challenge=True 时错误是 Cloudflare 挑战页，否则是 503
+    """
+
+    def __init__(self, fixture_dir=None, fallback=None, latency=(0.0, 0.0),
+                 error_rate=0.0, challenge=False, host="127.0.0.1", port=0):
+        from http.server import ThreadingHTTPServer   # 只有起服务器时才需要，client 导入本模块不付这笔成本
+        self.fixtures   = {}
+        self.fallback   = fallback
+        self.latency    = latency
+        self.error_rate = error_rate
+        self.challenge  = challenge
+        self.requests   = 0
+        self.bytes_sent = 0
+        self._lock      = threading.Lock()
+        if fixture_dir:
+            for f in Path(fixture_dir).glob("*.json"):
+                fx = json.loads(f.read_text(encoding="utf-8"))
+                self.fixtures[fixture_key(fx["method"], fx["url"])] = fx
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._httpd.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def respond(self, method: str, url: str, body: bytes):
+        if self.latency[1]:
+            time.sleep(random.uniform(*self.latency))
+        if self.error_rate and random.random() < self.error_rate:
+            if self.challenge:
+                return 403, {"Content-Type": "text/html", "cf-mitigated": "challenge"}, _CHALLENGE
+            return 503, {"Content-Type": "text/plain"}, "injected error"
+        fx = self.fixtures.get(fixture_key(method, url))
+        if fx:
+            return fx["status"], fx["headers"], fx["body"]
+        if self.fallback and (res := self.fallback(method, url, body)):
+            return res
+        return 404, {"Content-Type": "text/plain"}, "no fixture"
+
+    def _handler(self):
+        from http.server import BaseHTTPRequestHandler
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _serve(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body   = self.rfile.read(length) if length else b""
+                url    = "https://" + self.path.lstrip("/")
+                status, headers, text = server.respond(self.command, url, body)
+                # 和真实站点一样应答条件请求，磁盘 HTTP 缓存（scraper/httpcache.py）才测得出效果
+                etag = next((v for k, v in headers.items() if k.lower() == "etag"), None)
+                if status == 200 and etag and self.headers.get("If-None-Match") == etag:
+                    status, text = 304, ""
+                data = text.encode("utf-8")
+                with server._lock:
+                    server.requests   += 1
+                    server.bytes_sent += len(data)
+                self.send_response(status)
+                for k, v in headers.items():
+                    self.send_header(k, v)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = _serve
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    ap = argparse.ArgumentParser(description="回放录制的 HTTP fixture")
+    ap.add_argument("fixtures")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--latency", type=float, nargs=2, default=(0.0, 0.0))
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--challenge", action="store_true")
+    args = ap.parse_args()
+    srv = ReplayServer(args.fixtures, latency=tuple(args.latency), error_rate=args.error_rate,
+                       challenge=args.challenge, port=args.port).start()
+    print(f"回放服务器 {srv.url}（{len(srv.fixtures)} 个 fixture），设置 HTTP_REPLAY={srv.url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        srv.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+跨运行保存 Cloudflare clearance / cookie，热启动时跳过挑战页。
+
+每个域名保存一份：cookie 列表（带各自的过期时间）+ 当时的 User-Agent
+（cf_clearance 和 UA 绑定，换了 UA 就失效）。启动时 restore() 把没过期的
+cookie 装回 session，进程退出时 persist() 写回 data/sessions.json。
+任何响应是挑战页时，该域名保存的 cookie 立即作废；直到后面有正常响应才会再次保存。
+
+data/sessions.json 含登录态一类的敏感 cookie，不进 git，CI 里用 actions/cache 传递。
+"""
+import atexit
+import json
+import threading
+import time
+from pathlib import Path
+
+SESSION_FILE = Path("data/sessions.json")
+MAX_AGE      = 12 * 3600   # 没有 expires 的 cookie 最多沿用多久（秒）
+EXPIRY_SLACK = 60          # 快过期的 cookie 不再恢复
+
+_lock = threading.Lock()
+_store: dict | None = None
+_healthy: dict[str, bool] = {}   # 域名 → 最近一次响应是否正常
+
+
+def _load() -> dict:
+    global _store
+    if _store is None:
+        try:
+            _store = json.loads(SESSION_FILE.read_text(encoding="utf-8"))
+        except Exception:
+            _store = {}
+    return _store
+
+
+def restore(session, domain: str):
+    """把 domain 保存的 cookie / UA 装回 session，并挂上挑战页检测和退出时保存"""
+    now = time.time()
+    with _lock:
+        entry = _load().get(domain) or {}
+    if entry:
+        restored = 0
+        for c in entry.get("cookies", []):
+            expires = c.get("expires") or entry["saved_at"] + MAX_AGE
+            if expires - EXPIRY_SLACK < now:
+                continue
+            session.cookies.set(c["name"], c["value"], domain=c["domain"],
+                                path=c.get("path", "/"), secure=c.get("secure", False),
+                                expires=c.get("expires"))
+            restored += 1
+        if restored and entry.get("user_agent"):
+            session.headers["User-Agent"] = entry["user_agent"]
+        if restored:
+            print(f"    [session] {domain}: 恢复 {restored} 个 cookie")
+    session.hooks.setdefault("response", []).append(_watch(session, domain))
+    atexit.register(persist, session, domain)
+
+
+def persist(session, domain: str):
+    if not _healthy.get(domain):
+        return
+    cookies = [
+        {"name": c.name, "value": c.value, "domain": c.domain, "path": c.path,
+         "secure": c.secure, "expires": c.expires}
+        for c in session.cookies if c.domain.lstrip(".").endswith(domain)
+    ]
+    with _lock:
+        store = _load()
+        store[domain] = {
+            "saved_at":   int(time.time()),
+            "user_agent": session.headers.get("User-Agent", ""),
+            "cookies":    cookies,
+        }
+        SESSION_FILE.parent.mkdir(exist_ok=True)
+        SESSION_FILE.write_text(json.dumps(store, indent=1), encoding="utf-8")
+
+
+def invalidate(session, domain: str):
+    """挑战页：丢掉 domain 的 cookie（内存和磁盘），让 cloudscraper 重新过挑战"""
+    for c in [c for c in session.cookies if c.domain.lstrip(".").endswith(domain)]:
+        session.cookies.clear(c.domain, c.path, c.name)
+    with _lock:
+        store = _load()
+        if store.pop(domain, None) is not None:
+            SESSION_FILE.write_text(json.dumps(store, indent=1), encoding="utf-8")
+    _healthy[domain] = False
+
+
+def is_challenge(resp) -> bool:
+    if resp.status_code not in (403, 429, 503):
+        return False
+    if resp.headers.get("cf-mitigated") == "challenge":
+        return True
+    head = resp.text[:4096]
+    return "Just a moment" in head or "cf-chl" in head or "challenge-platform" in head
+
+
+def _watch(session, domain: str):
+    def hook(resp, *args, **kwargs):
+        if is_challenge(resp):
+            print(f"    [session] {domain}: 遇到挑战页，作废已保存的 cookie")
+            invalidate(session, domain)
+        elif resp.status_code < 400:
+            _healthy[domain] = True
+        return resp
+    return hook
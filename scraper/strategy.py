@@ -0,0 +1,87 @@
+"""
+多级抓取策略的自适应排序（持久化的计分板）
+
+每条降级链（如 "Woolworths"、"Coles/discover"）的每层策略记录成功率
+（指数滑动平均，从 1.0 起步）、每件商品的平均耗时（批量接口按批内件数摊开）
+和最近一次尝试的时间。order() 的规则：
+- 默认按声明的顺序；某层样本够 MIN_SAMPLES 且成功率低于 DEMOTE_BELOW 才降到后面。
+  API 被封几周时，每件商品不必再先为失败的第一层付出一次请求；
+  一直成功的主策略不会因为备用层"没试过"或者慢一点就被换掉
+- 两层都健康且都有足够样本时，后面那层每件商品的耗时不到前面的 1/FASTER_BY 才提前
+- 被降级的层距上次尝试超过 PROBE_AFTER 秒就按原位置再试一次（时间记在计分板里，
+  每次运行只调用一次 order() 的链也会被重新探测）
+
+计分板保存在 data/strategy_scores.json，进程退出时写回。
+"""
+import atexit
+import json
+import threading
+import time
+from pathlib import Path
+
+SCORE_FILE  = Path("data/strategy_scores.json")
+DECAY        = 0.8    # 越小越看重最近的结果
+MIN_SAMPLES  = 5
+DEMOTE_BELOW = 0.5    # 成功率低于这个才降级
+FASTER_BY    = 2.0    # 健康的层之间：每件商品快这么多倍才调换顺序
+PROBE_AFTER  = 6 * 3600   # 秒；被降级的层这么久没试过就再试一次
+
+_lock   = threading.Lock()
+_scores: dict | None = None
+
+
+def _load() -> dict:
+    global _scores
+    if _scores is None:
+        try:
+            _scores = json.loads(SCORE_FILE.read_text(encoding="utf-8"))
+        except Exception:
+            _scores = {}
+        atexit.register(save)
+    return _scores
+
+
+def order(chain: str, tiers: list[str], now: float | None = None) -> list[str]:
+    """返回本次调用应尝试的顺序；没有记录的层按健康处理，保持声明顺序"""
+    now = now or time.time()
+    with _lock:
+        board = _load().get(chain, {})
+
+        def measured(tier):
+            return (board.get(tier) or {}).get("n", 0) >= MIN_SAMPLES
+
+        def demoted(tier):
+            s = board.get(tier)
+            return (measured(tier) and s["rate"] < DEMOTE_BELOW
+                    and now - s.get("last", 0) < PROBE_AFTER)
+
+        healthy = [t for t in tiers if not demoted(t)]
+        # 健康的层之间：只有明显更快（按每件商品算）才往前挪
+        for i in range(1, len(healthy)):
+            j = i
+            while (j and measured(healthy[j]) and measured(healthy[j - 1])
+                   and board[healthy[j]]["seconds"] * FASTER_BY < board[healthy[j - 1]]["seconds"]):
+                healthy[j - 1], healthy[j] = healthy[j], healthy[j - 1]
+                j -= 1
+        rest = sorted((t for t in tiers if t not in healthy), key=lambda t: -board[t]["rate"])
+        return healthy + rest
+
+
+def record(chain: str, tier: str, ok: bool, seconds: float, items: int = 1):
+    """一次尝试的结果；批量接口传 items（批内件数），耗时按每件商品记"""
+    per_item = seconds / max(items, 1)
+    with _lock:
+        board = _load().setdefault(chain, {})
+        s = board.setdefault(tier, {"rate": 1.0, "seconds": round(per_item, 3), "n": 0})
+        s["rate"]    = round(DECAY * s["rate"] + (1 - DECAY) * float(ok), 4)
+        s["seconds"] = round(DECAY * s["seconds"] + (1 - DECAY) * per_item, 3)
+        s["n"]      += 1
+        s["last"]    = int(time.time())
+
+
+def save():
+    with _lock:
+        if not _scores:
+            return
+        SCORE_FILE.parent.mkdir(exist_ok=True)
+        SCORE_FILE.write_text(json.dumps(_scores, indent=1, sort_keys=True), encoding="utf-8")
@@ -6,104 +6,284 @@ Woolworths 爬虫 — cloudscraper 版
   1. JSON API  (/apis/ui/product/detail)  — 最快
   2. HTML &q;  编码 JSON                  — API 被拦时的备用
   3. Next.js __NEXT_DATA__ script 标签   — 最后手段
+
+各层的先后顺序由 scraper/strategy.py 的计分板决定：某层长期失败会被排到后面，
+并定期重新探测。
+
+整张 watchlist 用 get_prices() 批量查：多商品接口 /apis/ui/products/{id,id,...}
+每次最多 BATCH_SIZE 个，批量里拿不到的 ID 再逐个走 HTML 提取。
 """
 import re
 import json
-import cloudscraper
+import time
 
-STORE_ID = "3298"   # Woolworths Carnegie North
-POSTCODE = "3163"
+from scraper import client, httpcache, metrics, record, strategy
 
-# 全局复用同一个 scraper 实例（复用 session，减少握手次数）
-_scraper = cloudscraper.create_scraper(
-    browser={"browser": "chrome", "platform": "darwin", "mobile": False}
-)
+STORE_ID   = "3298"   # Woolworths Carnegie North
+POSTCODE   = "3163"
+BATCH_SIZE = 24       # 多商品接口单次 ID 数（URL 长度安全范围内）
 
 _BASE_HEADERS = {
     "Accept":          "application/json, text/html, */*",
     "Accept-Language": "en-AU,en;q=0.9",
     "Referer":         "https://www.woolworths.com.au/",
-    # Cookie 把门店设为 Carnegie North，使 Specials 显示该门店价格
-    "Cookie":          f"wow-store-id={STORE_ID}; wow-postcode={POSTCODE}",
 }
+# 把门店设为 Carnegie North，使 Specials 显示该门店价格。按请求传 cookies= 而不是写 Cookie 头：
+# 显式的 Cookie 头会让 requests 不再带 session 里的 cookie（恢复出来的 cf_clearance 就白存了）
+_COOKIES = {"wow-store-id": STORE_ID, "wow-postcode": POSTCODE}
 
 
 def get_price(product_id: str) -> dict | None:
-    result = _try_api(product_id)
-    if result:
-        return result
-    print(f"    [WW] JSON API 无数据，降级到 HTML 提取…")
-    return _try_html(product_id)
+    tiers = strategy.order("Woolworths", ["api", "html"])
+    for n, tier in enumerate(tiers):
+        if n:
+            print(f"    [WW] {_TIER_NAMES[tiers[n - 1]]} 无数据，降级到 {_TIER_NAMES[tier]}…")
+        result = _timed_tier("Woolworths", tier, _TIERS[tier], product_id)
+        if result:
+            return result
+    return None
+
+
+def get_prices(product_ids: list[str], should_stop=None) -> dict[str, dict]:
+    """
+    批量取价：{product_id: 结果}，拿不到的 ID 不出现在结果里。
+    should_stop() 返回真时不再发起新的逐个 HTML 请求（调度器的截止时间）。
+    """
+    ids = list(dict.fromkeys(str(i) for i in product_ids))
+    results = {}
+    if strategy.order("Woolworths/batch", ["api_batch", "html"])[0] == "api_batch":
+        for start in range(0, len(ids), BATCH_SIZE):
+            batch = ids[start:start + BATCH_SIZE]
+            results.update(_timed_tier("Woolworths/batch", "api_batch", _try_api_batch, batch, len(batch)))
+    else:
+        print("    [WW] 批量接口近期不可用，直接走 HTML 提取…")
+    missing = [pid for pid in ids if pid not in results]
+    if missing and results:
+        print(f"    [WW] 批量接口缺 {len(missing)} 个商品，逐个降级到 HTML 提取…")
+    elif missing:
+        print(f"    [WW] 批量接口无数据，{len(missing)} 个商品逐个降级到 HTML 提取…")
+    for pid in missing:
+        if should_stop and should_stop():
+            break
+        if r := _timed_tier("Woolworths/batch", "html", _try_html, pid):
+            results[pid] = r
+    return results
+
+
+def _timed_tier(chain, tier, fn, arg, items=1):
+    t0 = time.perf_counter()
+    result = fn(arg)
+    strategy.record(chain, tier, bool(result), time.perf_counter() - t0, items)
+    return result
 
 
 # ── 策略 1：JSON API ──────────────────────────────────────────────────────────
 
+@metrics.timed("Woolworths", "api")
 def _try_api(product_id: str) -> dict | None:
     url = f"https://www.woolworths.com.au/apis/ui/product/detail/{product_id}"
     try:
-        r = _scraper.get(url, headers=_BASE_HEADERS, timeout=15)
+        r = client.get("Woolworths", url, headers=_BASE_HEADERS, cookies=_COOKIES)
         if r.status_code != 200:
             return None
         data = r.json()
         p = data.get("Product") or (data[0] if isinstance(data, list) else data)
-        price = p.get("Price")
-        if not price:
-            return None
-        return _build(
-            name=p.get("Name", ""),
-            price=float(price),
-            was=p.get("WasPrice"),
-            special=bool(p.get("IsOnSpecial")),
-            cup=p.get("CupString", ""),
-            src="json_api",
-        )
+        return _from_api(p)
     except Exception as e:
         print(f"    [WW] API 异常: {e}")
         return None
 
 
+@metrics.timed("Woolworths", "api_batch")
+def _try_api_batch(product_ids: list[str]) -> dict[str, dict]:
+    """一次请求查多个商品；返回的是商品对象列表，按 Stockcode 对回 ID"""
+    url = f"https://www.woolworths.com.au/apis/ui/products/{','.join(product_ids)}"
+    try:
+        r = client.get("Woolworths", url, headers=_BASE_HEADERS, cookies=_COOKIES)
+        if r.status_code != 200:
+            return {}
+        data = r.json()
+        items = data if isinstance(data, list) else data.get("Products") or []
+        results = {}
+        for p in items:
+            p = p.get("Product") or p
+            pid = str(p.get("Stockcode", ""))
+            if pid in product_ids and (res := _from_api(p)):
+                results[pid] = res
+        return results
+    except Exception as e:
+        print(f"    [WW] 批量 API 异常: {e}")
+        return {}
+
+
+def _from_api(p: dict) -> dict | None:
+    price = p.get("Price")
+    if not price:
+        return None
+    return _build(
+        name=p.get("Name", ""),
+        price=float(price),
+        was=p.get("WasPrice"),
+        special=bool(p.get("IsOnSpecial")),
+        cup=p.get("CupString", ""),
+        src="json_api",
+    )
+
+
 # ── 策略 2 + 3：HTML 页面 ─────────────────────────────────────────────────────
 
+@metrics.timed("Woolworths", "html")
 def _try_html(product_id: str) -> dict | None:
     url = f"https://www.woolworths.com.au/shop/productdetails/{product_id}"
     try:
-        r = _scraper.get(
-            url,
-            headers={**_BASE_HEADERS, "Accept": "text/html"},
-            timeout=20,
-        )
-        html = r.text
-        return _parse_encoded(html, product_id) or _parse_next_data(html, product_id)
+        r = client.get("Woolworths", url, headers={**_BASE_HEADERS, "Accept": "text/html"},
+                       cookies=_COOKIES, cache=True)
+        if r.status_code != 200:
+            return None
+        # 页面没变（304）时直接用上次的解析结果（缓存里存 record.encode 的列表，能 JSON 序列化）
+        found = httpcache.derived(r, "ww_product/v2",
+                                  lambda: (res := _parse_html(r.text, product_id)) and record.encode(res))
+        return record.decode(found) if found else None
     except Exception as e:
         print(f"    [WW] HTML 异常: {e}")
         return None
 
 
+def _parse_html(html: str, product_id: str) -> dict | None:
+    for tier in strategy.order("Woolworths/parse", ["encoded", "next_data"]):
+        t0 = time.perf_counter()
+        result = _PARSERS[tier](html, product_id)
+        strategy.record("Woolworths/parse", tier, bool(result), time.perf_counter() - t0)
+        if result:
+            return result
+    return None
+
+
+# 商品 JSON 在页面里只占几 KB：先定位这一段再解码，不复制 / 不扫描整页
+MAX_SCAN      = 2_000_000  # 找锚点最多看页面前这么多字符
+REGION_BEFORE = 4_000      # 锚点（本商品的 Stockcode 字段）前后最多看多少字符
+REGION_AFTER  = 8_000
+MAX_NEXT_DATA = 1_000_000  # __NEXT_DATA__ 超过这个大小就不整体解析
+
+# 一次扫描取全部字段；引号既可能是 " 也可能是 &q;，不先做整页替换
+_Q = r'(?:"|&q;)'
+_FIELD_RE = re.compile(
+    _Q + r'(Name|Price|WasPrice|IsOnSpecial|CupString)' + _Q + r'\s*:\s*'
+    r'(?:' + _Q + r'([^"&]*(?:&(?!q;)[^"&]*)*)' + _Q + r'|([\d.]+|true|false))'
+)
+_FIELDS   = 5
+_BRACE_RE = re.compile(r"[{}]")
+_CODE_RE  = re.compile(r"\s*:\s*(\d+)")
+_NEXT_TAG = '<script id="__NEXT_DATA__"'
+_decoder  = json.JSONDecoder()
+
+
+def _region(html: str, pid: str) -> tuple[int, int] | None:
+    """
+    Stockcode 等于 pid 的那个商品对象（编码或未编码）。推荐位、最近浏览里的商品也有
+    Price，不能按第一个 Price 取；页面里完全没有 Stockcode 时才退回第一个 Price 附近
+    """
+    seen = False
+    for key in ("&q;Stockcode&q;", '"Stockcode"'):
+        at = html.find(key, 0, MAX_SCAN)
+        seen = seen or at >= 0
+        while at >= 0:
+            end = at + len(key)
+            if (m := _CODE_RE.match(html, end)) and m.group(1) == pid:
+                return _object_span(html, at)
+            at = html.find(key, end, MAX_SCAN)
+    if seen:
+        return None
+    hits = [i for q in ("&q;Price&q;", '"Price"') if (i := html.find(q, 0, MAX_SCAN)) >= 0]
+    if not hits:
+        return None
+    at = min(hits)
+    return max(0, at - REGION_BEFORE), min(len(html), at + REGION_AFTER)
+
+
+def _object_span(html: str, at: int) -> tuple[int, int] | None:
+    """包住 at 的那一层 {...}（只数花括号；找不全就截到 REGION_AFTER）"""
+    lo, i, depth = max(0, at - REGION_BEFORE), at, 0
+    while True:
+        o, c = html.rfind("{", lo, i), html.rfind("}", lo, i)
+        if o < 0:
+            return None
+        if c > o:
+            depth, i = depth + 1, c
+        elif depth:
+            depth, i = depth - 1, o
+        else:
+            break
+    hi = min(len(html), at + REGION_AFTER)
+    for b in _BRACE_RE.finditer(html, o, hi):
+        depth += 1 if b.group() == "{" else -1
+        if not depth:
+            return o, b.end()
+    return o, hi
+
+
+@metrics.timed("Woolworths", "parse_encoded")
 def _parse_encoded(html: str, pid: str) -> dict | None:
     """&q;Price&q;:2.9 这种 HTML 转义 JSON（Woolworths 常见嵌入方式）"""
-    c = html.replace("&q;", '"').replace("&amp;", "&")
-    pm = re.search(r'"Price"\s*:\s*([\d.]+)', c)
-    if not pm:
+    span = _region(html, pid)
+    if not span:
+        return None
+    found = {}
+    for m in _FIELD_RE.finditer(html, *span):
+        key, text, bare = m.groups()
+        if key in found:
+            continue
+        # 和原来逐字段 re.search 一样：类型不对的出现跳过，继续找下一个
+        if key in ("Name", "CupString"):
+            if text is not None and (key == "CupString" or 3 <= len(text) <= 100):
+                found[key] = text.replace("&amp;", "&")
+        elif key == "IsOnSpecial":
+            if bare in ("true", "false"):
+                found[key] = bare == "true"
+        elif bare and bare not in ("true", "false"):
+            found[key] = float(bare)
+        if len(found) == _FIELDS:
+            break
+    if "Price" not in found:
         return None
     return _build(
-        name=_rx(r'"Name"\s*:\s*"([^"]{3,100})"', c, f"WW-{pid}"),
-        price=float(pm.group(1)),
-        was=float(_rx(r'"WasPrice"\s*:\s*([\d.]+)', c) or 0) or None,
-        special=_rx(r'"IsOnSpecial"\s*:\s*(true|false)', c) == "true",
-        cup=_rx(r'"CupString"\s*:\s*"([^"]*)"', c, ""),
+        name=found.get("Name", f"WW-{pid}"),
+        price=found["Price"],
+        was=found.get("WasPrice") or None,
+        special=found.get("IsOnSpecial", False),
+        cup=found.get("CupString", ""),
         src="html_encoded",
     )
 
 
+@metrics.timed("Woolworths", "parse_next_data")
 def _parse_next_data(html: str, pid: str) -> dict | None:
-    """Next.js __NEXT_DATA__ 嵌入 JSON"""
-    m = re.search(r'<script id="__NEXT_DATA__"[^>]*>(.+?)</script>', html, re.DOTALL)
-    if not m:
+    """Next.js __NEXT_DATA__ 嵌入 JSON：只解码其中的 "product" 对象，找不到再整体解析"""
+    start = html.find(_NEXT_TAG, 0, MAX_SCAN)
+    if start < 0 or (start := html.find(">", start) + 1) == 0:
+        return None
+    end = html.find("</script>", start)
+    if end < 0:
         return None
     try:
-        data = json.loads(m.group(1))
-        props = data.get("props", {}).get("pageProps", {})
-        p = props.get("product") or props.get("initialData", {}).get("product")
+        # 页面里推荐位、最近浏览也有 "product"：只认编号对得上的那个
+        p   = None
+        key = html.find('"product":', start, end)
+        while key >= 0 and p is None:
+            at = key + len('"product":')
+            while html[at] in " \t\r\n":
+                at += 1
+            if html[at] == "{":
+                cand, at = _decoder.raw_decode(html, at)
+                if isinstance(cand, dict) and _stockcode(cand) == pid:
+                    p = cand
+            key = html.find('"product":', at, end)
+        if p is None and end - start <= MAX_NEXT_DATA:
+            # 都对不上（或者商品对象里没有编号）：按页面结构取 pageProps 里的商品
+            props = json.loads(html[start:end]).get("props", {}).get("pageProps", {})
+            p = props.get("product") or props.get("initialData", {}).get("product")
+            if p and _stockcode(p) not in (None, pid):
+                return None
         if not p:
             return None
         price = p.get("price") or p.get("Price")
@@ -114,28 +294,27 @@ def _parse_next_data(html: str, pid: str) -> dict | None:
             price=float(price),
             was=p.get("wasPrice") or p.get("WasPrice"),
             special=bool(p.get("isOnSpecial") or p.get("IsOnSpecial")),
-            cup="",
+            cup=p.get("cupString") or p.get("CupString") or "",
             src="next_data",
         )
     except Exception:
         return None
 
 
+def _stockcode(p: dict) -> str | None:
+    for k in ("stockcode", "Stockcode", "id"):
+        if p.get(k) is not None:
+            return str(p[k])
+    return None
+
+
+_TIERS      = {"api": _try_api, "html": _try_html}
+_TIER_NAMES = {"api": "JSON API", "html": "HTML 提取"}
+_PARSERS    = {"encoded": _parse_encoded, "next_data": _parse_next_data}
+
+
 # ── 工具 ──────────────────────────────────────────────────────────────────────
 
-def _rx(pattern: str, text: str, default=None):
-    m = re.search(pattern, text)
-    return m.group(1) if m else default
-
-
-def _build(name, price, was, special, cup, src) -> dict:
-    return {
-        "store":      "Woolworths",
-        "branch":     "Carnegie North #3298",
-        "name":       name,
-        "price":      price,
-        "was_price":  was,
-        "unit_price": cup,
-        "on_special": special,
-        "source":     src,
-    }
+def _build(name, price, was, special, cup, src) -> record.PriceRecord:
+    return record.build("Woolworths", "Carnegie North #3298", name, price,
+                        was_price=was, on_special=special, source=src, unit_text=cup)
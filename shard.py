@@ -0,0 +1,89 @@
+"""
+分片执行：大 watchlist 拆给 N 个进程（或 N 个 CI matrix job）
+
+- 分配：按商品名做 jump consistent hash（Lamping & Veach），同一商品永远落在同一片；
+  N 变化时只有约 1/N 的商品换片，其余商品的缓存和计分板照常可用
+- 每片只抓自己的商品，结果写成部分快照 data/shards/<i>-of-<N>.json，
+  不发通知、不写 prices.json / 历史；合并步骤读齐所有部分快照后统一对比、通知、保存
+- 每片的会话 cookie、策略计分板、Coles 状态、商品身份索引、检查点、运行报告放在
+  data/shards/<i>-of-<N>/ 下，多个进程不会同时写同一个文件
+"""
+import hashlib
+import json
+from datetime import datetime
+from pathlib import Path
+
+from scraper import record
+
+SHARD_DIR = Path("data/shards")
+
+
+def parse(spec: str) -> tuple[int, int]:
+    """"2/4" → (2, 4)，分片从 0 开始编号"""
+    i, n = (int(x) for x in spec.split("/"))
+    if not 0 <= i < n:
+        raise ValueError(f"分片编号超出范围: {spec}")
+    return i, n
+
+
+def shard_of(name: str, n: int) -> int:
+    """jump consistent hash：输入是商品名的稳定 64 位哈希（不用 hash()，它每个进程随机）"""
+    key = int.from_bytes(hashlib.blake2b(name.encode("utf-8"), digest_size=8).digest(), "big")
+    b, j = -1, 0
+    while j < n:
+        b   = j
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        j   = int((b + 1) * (1 << 31) / ((key >> 33) + 1))
+    return b
+
+
+def select(watchlist: list, i: int, n: int) -> list:
+    return [item for item in watchlist if shard_of(item["name"], n) == i]
+
+
+def _name(i: int, n: int) -> str:
+    return f"{i}-of-{n}"
+
+
+def localise(i: int, n: int):
+    """把本进程各模块的缓存 / 状态文件改到 data/shards/<i>-of-<N>/ 下（在任何抓取之前调用）"""
+    import scheduler
+    from scraper import coles, identity, metrics, sessions, strategy
+
+    home = SHARD_DIR / _name(i, n)
+    home.mkdir(parents=True, exist_ok=True)
+    sessions.SESSION_FILE     = home / "sessions.json"
+    strategy.SCORE_FILE       = home / "strategy_scores.json"
+    coles.STATE_FILE          = home / "coles_state.json"
+    identity.IDENTITY_FILE    = home / "identity.json"
+    scheduler.CHECKPOINT_FILE = home / "checkpoint.jsonl"
+    if metrics.enabled():
+        metrics.METRICS_DIR = str(Path(metrics.METRICS_DIR) / _name(i, n))
+    # httpcache.CACHE_DIR 保持共用（CI 里整个目录由 actions/cache 传递，Coles 发现页各分片都要）：
+    # 条目写入是临时文件 + replace，临时文件名带进程号，多个分片同时写同一条目不会互相踩
+
+
+def write_partial(i: int, n: int, fetched: dict, skipped: list):
+    SHARD_DIR.mkdir(parents=True, exist_ok=True)
+    path = SHARD_DIR / f"{_name(i, n)}.json"
+    tmp  = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps({"shard": i, "shards": n, "fetched": record.pack(fetched), "skipped": skipped,
+                               "finished_at": datetime.now().isoformat(timespec="minutes")},
+                              ensure_ascii=False), encoding="utf-8")
+    tmp.replace(path)    # 合并步骤永远不会读到写了一半的文件
+
+
+def merge(n: int) -> tuple[dict, list, list]:
+    """读齐 N 个部分快照 → (fetched, skipped, 缺失的分片)；读过的部分快照随即删除"""
+    fetched, skipped, missing = {}, [], []
+    for i in range(n):
+        path = SHARD_DIR / f"{_name(i, n)}.json"
+        try:
+            part = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            missing.append(i)
+            continue
+        fetched.update(record.unpack(part["fetched"]))
+        skipped.extend(part["skipped"])
+        path.unlink()
+    return fetched, skipped, missing